@@ -8,6 +8,10 @@ PACKAGE_CACHE="$HOME/package_cache"
 UBUNTU_REPO="$HOME/lubuntu_package_cache"
 mkdir -p "$BASE_DIR" "$PIP_CACHE" "$PACKAGE_CACHE" "$UBUNTU_REPO"
 
+# Shared content-addressed store, so identical files in these directories are kept once
+BLOB_TOOL="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)/blob_store.py"
+BLOB_STORE="$BASE_DIR/.blobs"
+
 # Update and upgrade system
 echo "Updating system and installing essential system packages..."
 sudo apt update && sudo apt full-upgrade -y
@@ -63,7 +67,8 @@ sudo apt download --yes $(apt list --installed | cut -d/ -f1) -o Dir::Cache="$UB
 # **Create a local offline repository**
 echo "Creating local Lubuntu repository..."
 mkdir -p "$UBUNTU_REPO/dists/stable/main/binary-amd64"
-cp "$UBUNTU_REPO"/*.deb "$UBUNTU_REPO/dists/stable/main/binary-amd64"
+# Hardlink the packages into the repository through the blob store instead of copying them
+sudo python3 "$BLOB_TOOL" --store "$BLOB_STORE" link "$UBUNTU_REPO"/*.deb "$UBUNTU_REPO/dists/stable/main/binary-amd64"
 cd "$UBUNTU_REPO/dists/stable/main/binary-amd64"
 dpkg-scanpackages . /dev/null | gzip -9c > Packages.gz
 cd ~
@@ -83,6 +88,12 @@ sudo apt update
 echo "Cloning survival resources repository..."
 git clone --depth=1 "https://github.com/TheGodRX/offgrid.git" "$BASE_DIR/HOME" || { echo "Git clone failed!"; exit 1; }
 
+# Deduplicate the package caches into the blob store
+# The library itself is deduplicated by offgrid1.0.py --dedupe, which only takes finished resources
+# Only the packages are taken from the repository, its index is regenerated on every run
+echo "Deduplicating package caches..."
+sudo python3 "$BLOB_TOOL" --store "$BLOB_STORE" ingest "$PIP_CACHE" "$PACKAGE_CACHE" "$UBUNTU_REPO"/*.deb
+
 # Finished
 echo "All resources downloaded! You can now install packages offline."
 echo "Run 'python3 offgrid1.0.py' to complete resource setup."
@@ -1,10 +1,23 @@
+import time
+
+# Taken before anything else loads, so time-to-first-window covers every import
+STARTED = time.perf_counter()
+
 import os
+import bisect
+import queue
+import shutil
 import subprocess
+import sys
+import threading
 import tkinter as tk
+from collections import OrderedDict, deque
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-import fitz  # PyMuPDF for PDFs
-import pygame  # For video playback
+import search_index  # Full-text index of the PDF library
+import previews  # Thumbnail cache of the PDFs and videos
+
+# PIL and PyMuPDF (fitz) are slow to import, so they are imported inside the
+# functions that use them and only load once a PDF is first opened
 
 # Folder where all resources are saved
 BASE_DIR = "offline_survival_resources"
@@ -19,14 +32,60 @@ categories = {
     "HOME": os.path.join(BASE_DIR, "HOME")
 }
 
-# Initialize pygame for video playback
-pygame.init()
+# PDF viewer settings
+PDF_ZOOM = 1.0          # Render scale, 1.0 is 72 dpi
+PDF_PAGE_GAP = 10       # Pixels between pages on the canvas
+PDF_PREFETCH_PAGES = 2  # Pages rendered above and below the visible region
+PDF_CACHE_PAGES = 24    # Rendered pages kept in the LRU cache
+
+# Rendered pages keyed by (document, page, zoom), shared by the render thread and the UI
+page_cache = OrderedDict()
+page_cache_lock = threading.Lock()
+
+# Pages to render go to a background thread, finished pages come back to the Tk thread
+render_requests = queue.Queue()
+rendered_pages = queue.Queue()
+
+# Script that updates the search index in its own process pool
+SEARCH_INDEX_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_index.py")
+SEARCH_DELAY_MS = 150  # Wait for a pause in typing before searching
+
+# (path, page number) behind each row of the file listbox, page is None for plain files
+listed_items = []
+search_after_id = None
+search_db = None  # Opened once the window is on screen
+
+# Directory listings are scanned on a background thread and cached per category
+LISTING_BATCH = 500  # Listbox rows inserted per Tk idle tick
+listing_cache = {}   # category -> ({directory: mtime_ns}, [file paths])
+listing_results = queue.Queue()
+listing_generation = 0  # Bumped whenever the listbox contents are replaced
+
+# Preview grid settings
+PREVIEWS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "previews.py")
+GRID_CELL_WIDTH = previews.PREVIEW_SIZE + 20
+GRID_CELL_HEIGHT = previews.PREVIEW_SIZE + 50  # Room for the file name under the preview
+
+# Cells of the preview grid currently on its canvas, keyed by their row in listed_items
+grid_view = {"shown": {}, "columns": 1}
+previews_updated = threading.Event()  # Set by the background preview update when it finishes
+
+# State of the PDF currently on the canvas
+pdf_view = {"path": None, "tops": [], "sizes": [], "wanted": range(0), "pending": set(), "shown": {}}
+
+# Video player settings
+VIDEO_BUFFER_FRAMES = 8  # Decoded frames held ahead of the screen, older ones are dropped
+VIDEO_POLL_MS = 10       # How often the Tk thread looks for a new frame
+
+# Video currently playing on the canvas, frames come from an ffmpeg pipe read on a background thread
+video_view = {"processes": [], "frames": None, "finished": None, "size": (0, 0), "photo": None,
+              "item": None, "shown": 0, "dropped": 0}
 
 # Function to open a file
-def open_file(file_path):
+def open_file(file_path, page_num=None):
     try:
         if file_path.endswith(".pdf"):
-            display_pdf(file_path)
+            display_pdf(file_path, page_num or 0)
         elif file_path.endswith((".mp4", ".avi", ".mov")):
             play_video(file_path)
         else:
@@ -39,107 +98,580 @@ def open_file(file_path):
     except Exception as e:
         messagebox.showerror("Error", f"Failed to open file: {e}")
 
-# Function to display a PDF in the interface (all pages)
-def display_pdf(file_path):
-    doc = fitz.open(file_path)
-    pdf_width, pdf_height = 640, 480  # Dimensions for the page display area
-    total_pages = len(doc)
-    
-    # Clear the canvas
+# Function to fetch a rendered page from the cache, marking it as recently used
+def cache_get(key):
+    with page_cache_lock:
+        if key in page_cache:
+            page_cache.move_to_end(key)
+            return page_cache[key]
+    return None
+
+# Function to add a rendered page to the cache, evicting the least recently used ones
+def cache_put(key, image):
+    with page_cache_lock:
+        page_cache[key] = image
+        page_cache.move_to_end(key)
+        while len(page_cache) > PDF_CACHE_PAGES:
+            page_cache.popitem(last=False)
+
+# Function to rasterize one page of an open document into a PIL image
+def render_page(doc, page_num, zoom):
+    import fitz  # PyMuPDF for PDFs
+    from PIL import Image
+
+    pix = doc.load_page(page_num).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+# Background thread that rasterizes pages so the UI never waits on PyMuPDF
+def render_worker():
+    import fitz  # PyMuPDF for PDFs
+
+    doc, doc_path = None, None
+    while True:
+        path, page_num, zoom = render_requests.get()
+        # Skip pages the user has already scrolled away from or documents that were closed
+        if path == pdf_view["path"] and page_num in pdf_view["wanted"] and cache_get((path, page_num, zoom)) is None:
+            try:
+                if doc_path != path:
+                    if doc is not None:
+                        doc.close()
+                    doc, doc_path = fitz.open(path), path
+                cache_put((path, page_num, zoom), render_page(doc, page_num, zoom))
+            except Exception as e:
+                print(f"Failed to render page {page_num + 1} of {path}. Error: {e}")
+        rendered_pages.put((path, page_num))
+
+# Function to place a cached page on the canvas
+def show_page(page_num):
+    from PIL import ImageTk
+
+    image = cache_get((pdf_view["path"], page_num, PDF_ZOOM))
+    if image is None or page_num in pdf_view["shown"]:
+        return
+    img_tk = ImageTk.PhotoImage(image)
+    item = pdf_canvas.create_image(0, pdf_view["tops"][page_num], anchor=tk.NW, image=img_tk)
+    # Keep a reference to every page on screen to prevent garbage collection
+    pdf_view["shown"][page_num] = (item, img_tk)
+
+# Function to move pages finished by the render thread onto the canvas
+def poll_rendered_pages():
+    while True:
+        try:
+            path, page_num = rendered_pages.get_nowait()
+        except queue.Empty:
+            break
+        if path == pdf_view["path"]:
+            pdf_view["pending"].discard(page_num)
+            if page_num in pdf_view["wanted"]:
+                show_page(page_num)
+    root.after(30, poll_rendered_pages)
+
+# Function to render the pages around the visible part of the canvas and drop the rest
+def update_visible_pages():
+    tops = pdf_view["tops"]
+    if not tops:
+        return
+    view_top = pdf_canvas.canvasy(0)
+    view_bottom = view_top + pdf_canvas.winfo_height()
+    first = max(bisect.bisect_right(tops, view_top) - 1 - PDF_PREFETCH_PAGES, 0)
+    last = min(bisect.bisect_right(tops, view_bottom) + PDF_PREFETCH_PAGES, len(tops))
+    pdf_view["wanted"] = range(first, last)
+
+    for page_num in list(pdf_view["shown"]):
+        if page_num not in pdf_view["wanted"]:
+            item, _ = pdf_view["shown"].pop(page_num)
+            pdf_canvas.delete(item)
+    for page_num in pdf_view["wanted"]:
+        if page_num in pdf_view["shown"] or page_num in pdf_view["pending"]:
+            continue
+        if cache_get((pdf_view["path"], page_num, PDF_ZOOM)) is not None:
+            show_page(page_num)
+        else:
+            pdf_view["pending"].add(page_num)
+            render_requests.put((pdf_view["path"], page_num, PDF_ZOOM))
+
+# Function to work out where every page goes on the canvas without loading the pages
+# Returns the top of each page, each page's (width, height) and the total height.
+def layout_pdf(doc, zoom=PDF_ZOOM):
+    tops, sizes = [], []
+    y = 0
+    for page in range(len(doc)):
+        box = doc.page_cropbox(page)
+        width, height = int(box.width * zoom), int(box.height * zoom)
+        tops.append(y)
+        sizes.append((width, height))
+        y += height + PDF_PAGE_GAP
+    return tops, sizes, y
+
+# Function to display a PDF in the interface
+# Pages are laid out from their real sizes straight away, but only the ones
+# near the visible region are rendered, on the background render thread.
+def display_pdf(file_path, page_num=0):
+    import fitz  # PyMuPDF for PDFs
+
+    with fitz.open(file_path) as doc:
+        tops, sizes, y = layout_pdf(doc)
+    stop_video()
+
+    # Clear the canvas and draw a placeholder for every page
     pdf_canvas.delete("all")
-    
-    # Display all pages
-    for page_num in range(total_pages):
-        page = doc.load_page(page_num)
-        pix = page.get_pixmap()
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        img_tk = ImageTk.PhotoImage(img)
-        
-        # Draw each page on the canvas at the appropriate position
-        pdf_canvas.create_image(0, page_num * pdf_height, anchor=tk.NW, image=img_tk)
-        pdf_canvas.image = img_tk  # Keep a reference to prevent garbage collection
-
-    # Adjust the canvas size based on the number of pages
-    pdf_canvas.config(scrollregion=pdf_canvas.bbox("all"))
+    pdf_view.update(path=file_path, tops=tops, sizes=sizes, wanted=range(0), pending=set(), shown={})
+    for top, (width, height) in zip(tops, sizes):
+        pdf_canvas.create_rectangle(0, top, width, top + height, fill="white", outline="")
+
+    # Adjust the canvas size based on the real page sizes
+    pdf_canvas.config(scrollregion=(0, 0, max((w for w, _ in sizes), default=0), y))
+    pdf_canvas.yview_moveto(tops[page_num] / y if page_num < len(tops) else 0)
+    update_visible_pages()
+
+# Function to keep the scrollbar in sync and render newly visible pages
+def on_pdf_scroll(first, last):
+    pdf_scrollbar.set(first, last)
+    update_visible_pages()
+
+# Function to scroll the PDF canvas with the mouse wheel
+def on_pdf_mousewheel(event):
+    if event.num == 4 or event.delta > 0:
+        pdf_canvas.yview_scroll(-3, "units")
+    else:
+        pdf_canvas.yview_scroll(3, "units")
+
+# Function to build the ffmpeg command that decodes a video to raw RGB frames of exactly width x height
+# The video is scaled (keeping its aspect ratio) and padded inside the decoder, and -re paces
+# the output at the video's own frame rate.
+def video_decoder_command(file_path, width, height):
+    fit = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+           f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2")
+    return ["ffmpeg", "-loglevel", "error", "-nostdin", "-re", "-i", file_path,
+            "-an", "-vf", fit, "-pix_fmt", "rgb24", "-f", "rawvideo", "pipe:1"]
+
+# Background thread that reads decoded frames into the playing video's ring buffer
+# The deque has a maximum length, so when the screen falls behind the oldest frames are dropped
+# and memory stays the same however long the video is.
+def video_reader(process, frames, finished, frame_bytes):
+    try:
+        while True:
+            frame = process.stdout.read(frame_bytes)
+            if len(frame) < frame_bytes:
+                break
+            frames.append(frame)
+    except OSError:
+        pass
+    finally:
+        process.stdout.close()
+        finished.set()
+
+# Function to stop the video that is playing, if any
+def stop_video():
+    for process in video_view["processes"]:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+    if video_view["frames"] is not None and video_view["shown"]:
+        print(f"Video stopped: {video_view['shown']} frames shown, {video_view['dropped']} dropped")
+    video_view.update(processes=[], frames=None, finished=None, photo=None, item=None, shown=0, dropped=0)
+
+# Function to show the newest decoded frame, skipping any the screen was too slow for
+def poll_video_frames(frames):
+    if video_view["frames"] is not frames:
+        return  # Another file was opened since this video started
+    frame = None
+    while frames:
+        if frame is not None:
+            video_view["dropped"] += 1
+        frame = frames.popleft()
+    if frame is not None:
+        width, height = video_view["size"]
+        # A binary PPM header is enough for Tk to take the raw RGB bytes without going through PIL
+        video_view["photo"].configure(data=b"P6\n%d %d\n255\n" % (width, height) + frame, format="PPM")
+        video_view["shown"] += 1
+    elif video_view["finished"].is_set():
+        stop_video()
+        return
+    root.after(VIDEO_POLL_MS, poll_video_frames, frames)
 
 # Function to play a video in the interface
+# ffmpeg decodes in a subprocess and a background thread keeps a few frames buffered,
+# so playback starts as soon as the first frame is decoded, even for multi-GB files.
+# The sound is played by ffplay alongside, when it is installed.
 def play_video(file_path):
-    # Set up the pygame window for video display
-    screen = pygame.display.set_mode((640, 480))  # Adjust as needed
-    movie = pygame.movie.Movie(file_path)
-    movie.set_display(screen)
-    movie.play()
+    stop_video()
+    width, height = max(pdf_canvas.winfo_width(), 2), max(pdf_canvas.winfo_height(), 2)
+    decoder = subprocess.Popen(video_decoder_command(file_path, width, height),
+                               stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+    processes = [decoder]
+    if shutil.which("ffplay"):
+        processes.append(subprocess.Popen(["ffplay", "-loglevel", "error", "-nodisp", "-autoexit", file_path],
+                                          stdin=subprocess.DEVNULL))
+
+    # Clear the canvas and put a single image on it that every frame is drawn into
+    pdf_canvas.delete("all")
+    pdf_view.update(path=None, tops=[], sizes=[], wanted=range(0), pending=set(), shown={})
+    photo = tk.PhotoImage(width=width, height=height)
+    item = pdf_canvas.create_image(0, 0, anchor=tk.NW, image=photo)
+    pdf_canvas.config(scrollregion=(0, 0, width, height))
+    pdf_canvas.yview_moveto(0)
+
+    frames, finished = deque(maxlen=VIDEO_BUFFER_FRAMES), threading.Event()
+    video_view.update(processes=processes, frames=frames, finished=finished, size=(width, height),
+                      photo=photo, item=item, shown=0, dropped=0)
+    threading.Thread(target=video_reader, args=(decoder, frames, finished, width * height * 3),
+                     daemon=True).start()
+    root.after(VIDEO_POLL_MS, poll_video_frames, frames)
+
+# Function to get a directory's mtime, or None if it does not exist
+def dir_mtime(directory):
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+# Function to list every file under a directory, skipping hidden directories such as .git
+# Returns the mtime of each directory visited so the listing can be invalidated later.
+def scan_directory(directory):
+    dir_mtimes, paths = {directory: dir_mtime(directory)}, []
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not entry.name.startswith("."):
+                            dir_mtimes[entry.path] = dir_mtime(entry.path)
+                            stack.append(entry.path)
+                    else:
+                        paths.append(entry.path)
+        except OSError:
+            continue
+    paths.sort()
+    return dir_mtimes, paths
+
+# Background thread that rescans a category unless its cached listing is still current
+def listing_worker(category, generation, cached):
+    if cached is not None and all(dir_mtime(d) == mtime for d, mtime in cached[0].items()):
+        return
+    listing_results.put((category, generation, scan_directory(categories[category])))
+
+# Function to move finished directory scans into the cache and the listbox
+def poll_listing_results():
+    while True:
+        try:
+            category, generation, listing = listing_results.get_nowait()
+        except queue.Empty:
+            break
+        listing_cache[category] = listing
+        if generation == listing_generation:
+            fill_listbox(listing[1], generation)
+    root.after(30, poll_listing_results)
+
+# Function to empty the listbox, cancelling any fill still in progress
+def clear_listbox():
+    global listing_generation
+    listing_generation += 1
+    file_listbox.delete(0, tk.END)
+    listed_items.clear()
+    grid_canvas.yview_moveto(0)
+    refresh_grid()
+    return listing_generation
+
+# Function to fill the listbox in batches so large listings never block the UI
+def fill_listbox(paths, generation, start=0):
+    if generation != listing_generation:
+        return
+    if start == 0:
+        file_listbox.delete(0, tk.END)
+        listed_items.clear()
+        refresh_grid()
+    batch = paths[start:start + LISTING_BATCH]
+    if batch:
+        file_listbox.insert(tk.END, *batch)
+        listed_items.extend((path, None) for path in batch)
+        grid_items_added()
+    if start + LISTING_BATCH < len(paths):
+        root.after(1, fill_listbox, paths, generation, start + LISTING_BATCH)
 
 # Function to list files in a category
+# A cached listing is shown straight away and refreshed in the background if any directory changed.
 def list_files(category):
-    file_listbox.delete(0, tk.END)
-    category_dir = categories[category]
-    if os.path.exists(category_dir):
-        for root, _, files in os.walk(category_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_listbox.insert(tk.END, file_path)
+    generation = clear_listbox()
+    cached = listing_cache.get(category)
+    if cached is not None:
+        fill_listbox(cached[1], generation)
+    threading.Thread(target=listing_worker, args=(category, generation, cached), daemon=True).start()
+
+# Function to show search hits in the file listbox
+def show_search_results(hits):
+    clear_listbox()
+    for path, page_num, snippet in hits:
+        file_listbox.insert(tk.END, f"{os.path.basename(path)} (page {page_num + 1}): {snippet}")
+        listed_items.append((path, page_num))
+    grid_items_added()
+
+# Function to load the cached preview of a file as a Tk image, or None if it has none yet
+def load_preview(path):
+    png = previews.preview_path(path)
+    if png is None:
+        return None
+    try:
+        return tk.PhotoImage(file=png)
+    except tk.TclError:
+        return None
+
+# Function to draw one cell of the preview grid: the preview (or a placeholder) and the file name
+def show_cell(index):
+    path, page_num = listed_items[index]
+    columns = grid_view["columns"]
+    x = (index % columns) * GRID_CELL_WIDTH + GRID_CELL_WIDTH // 2
+    y = (index // columns) * GRID_CELL_HEIGHT + 10
+    photo = load_preview(path)
+    if photo is not None:
+        items = [grid_canvas.create_image(x, y, anchor=tk.N, image=photo)]
+    else:
+        half = previews.PREVIEW_SIZE // 2
+        extension = os.path.splitext(path)[1].lstrip(".").upper() or "FILE"
+        items = [grid_canvas.create_rectangle(x - half, y, x + half, y + previews.PREVIEW_SIZE,
+                                              fill="#3a3f4b", outline=""),
+                 grid_canvas.create_text(x, y + half, text=extension, fill="white", font=("Arial", 14))]
+    label = os.path.basename(path) if page_num is None else f"{os.path.basename(path)} (page {page_num + 1})"
+    items.append(grid_canvas.create_text(x, y + previews.PREVIEW_SIZE + 4, text=label, anchor=tk.N, fill="white",
+                                         width=GRID_CELL_WIDTH - 10, font=("Arial", 9)))
+    # Keep a reference to every preview on screen to prevent garbage collection
+    grid_view["shown"][index] = (items, photo)
+
+# Function to draw the grid cells around the visible part of the canvas and drop the rest
+# Previews are only loaded from disk for cells that scroll into view.
+def update_visible_cells():
+    if not grid_canvas.winfo_ismapped():
+        return
+    columns = grid_view["columns"]
+    view_top = grid_canvas.canvasy(0)
+    first_row = max(int(view_top // GRID_CELL_HEIGHT) - 1, 0)
+    last_row = int((view_top + grid_canvas.winfo_height()) // GRID_CELL_HEIGHT) + 1
+    wanted = range(first_row * columns, min((last_row + 1) * columns, len(listed_items)))
+    for index in list(grid_view["shown"]):
+        if index not in wanted:
+            items, _ = grid_view["shown"].pop(index)
+            grid_canvas.delete(*items)
+    for index in wanted:
+        if index not in grid_view["shown"]:
+            show_cell(index)
+
+# Function to size the grid's scroll region to the listed items and draw any newly visible cells
+def grid_items_added():
+    rows = -(-len(listed_items) // grid_view["columns"])
+    grid_canvas.config(scrollregion=(0, 0, grid_view["columns"] * GRID_CELL_WIDTH, rows * GRID_CELL_HEIGHT))
+    update_visible_cells()
+
+# Function to redraw the whole grid, after the listing is replaced, the canvas is resized or previews change
+def refresh_grid():
+    grid_canvas.delete("all")
+    grid_view["shown"].clear()
+    grid_view["columns"] = max(grid_canvas.winfo_width() // GRID_CELL_WIDTH, 1)
+    grid_items_added()
+
+# Function to keep the grid scrollbar in sync and draw newly visible cells
+def on_grid_scroll(first, last):
+    grid_scrollbar.set(first, last)
+    update_visible_cells()
+
+# Function to scroll the preview grid with the mouse wheel
+def on_grid_mousewheel(event):
+    if event.num == 4 or event.delta > 0:
+        grid_canvas.yview_scroll(-1, "units")
+    else:
+        grid_canvas.yview_scroll(1, "units")
+
+# Function to open the file whose grid cell was clicked
+def on_grid_click(event):
+    x, y = grid_canvas.canvasx(event.x), grid_canvas.canvasy(event.y)
+    column, row = int(x // GRID_CELL_WIDTH), int(y // GRID_CELL_HEIGHT)
+    index = row * grid_view["columns"] + column
+    if column < grid_view["columns"] and index < len(listed_items):
+        open_file(*listed_items[index])
+
+# Function to switch the file area between the plain list and the preview grid
+def toggle_grid():
+    if show_previews.get():
+        file_listbox.pack_forget()
+        grid_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        grid_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    else:
+        grid_canvas.pack_forget()
+        grid_scrollbar.pack_forget()
+        file_listbox.pack(fill=tk.BOTH, expand=True)
+
+# Function to make previews for new or changed files in the background
+# Runs previews.py as its own process so its worker pool never re-imports this window.
+def refresh_previews():
+    try:
+        subprocess.run([sys.executable, PREVIEWS_SCRIPT], check=True)
+        previews_updated.set()
+    except Exception as e:
+        print(f"Failed to update the previews. Error: {e}")
+
+# Function to redraw the grid once the background preview update has finished
+def poll_previews():
+    if previews_updated.is_set():
+        previews_updated.clear()
+        refresh_grid()
+    root.after(500, poll_previews)
+
+# Function to search the library for what is typed in the search box
+def run_search():
+    global search_after_id
+    search_after_id = None
+    text = search_entry.get().strip()
+    if not text:
+        list_files(category_combobox.get())
+        return
+    if search_db is None:
+        return
+    try:
+        show_search_results(search_index.search(search_db, text))
+    except Exception as e:
+        print(f"Search for {text!r} failed. Error: {e}")
+
+# Function to search as the user types, once they pause
+def on_search_key(event):
+    global search_after_id
+    if search_after_id is not None:
+        root.after_cancel(search_after_id)
+    search_after_id = root.after(SEARCH_DELAY_MS, run_search)
+
+# Function to bring the search index up to date in the background
+# Runs search_index.py as its own process so its extraction pool never re-imports this window.
+def refresh_search_index():
+    try:
+        subprocess.run([sys.executable, SEARCH_INDEX_SCRIPT], check=True)
+    except Exception as e:
+        print(f"Failed to update the search index. Error: {e}")
+
+# Function to report how long the window took to appear, then do the deferred startup work
+# Runs once, from the first <Map> of the main window, after Tk has had an idle tick to paint it.
+def finish_startup():
+    global search_db
+    print(f"Window shown {(time.perf_counter() - STARTED) * 1000:.0f} ms after start")
+
+    # Open the search index and update it and the previews in the background
+    search_db = search_index.open_index()
+    threading.Thread(target=refresh_search_index, daemon=True).start()
+    threading.Thread(target=refresh_previews, daemon=True).start()
+
+    # Fill the initial category
+    list_files(category_combobox.get())
+
+# Function to schedule the deferred startup work the first time the main window is mapped
+def on_first_map(event):
+    if event.widget is root:
+        root.unbind("<Map>")
+        root.after_idle(finish_startup)
 
 # Function to handle file selection
 def on_file_select(event):
-    selected_file = file_listbox.get(file_listbox.curselection())
-    open_file(selected_file)
+    selection = file_listbox.curselection()
+    if selection:
+        file_path, page_num = listed_items[selection[0]]
+        open_file(file_path, page_num)
 
 # Function to handle category selection
 def on_category_select(event):
     selected_category = category_combobox.get()
     list_files(selected_category)
 
-# Create the main window
-root = tk.Tk()
-root.title("Survival Resources Interface")
-root.geometry("800x600")
-
-# Create a frame for the category selection
-category_frame = ttk.Frame(root, padding="10")
-category_frame.pack(fill=tk.X)
-
-# Create a label for the category selection
-category_label = ttk.Label(category_frame, text="Select Category:", font=("Arial", 14))
-category_label.pack(side=tk.LEFT, padx=5, pady=5)
-
-# Create a combobox for category selection
-category_combobox = ttk.Combobox(category_frame, values=list(categories.keys()), font=("Arial", 14))
-category_combobox.pack(side=tk.LEFT, padx=5, pady=5)
-category_combobox.bind("<<ComboboxSelected>>", on_category_select)
-
-# Create a frame for the file list
-file_frame = ttk.Frame(root, padding="10")
-file_frame.pack(fill=tk.BOTH, expand=True)
-
-# Create a listbox for file display
-file_listbox = tk.Listbox(file_frame, font=("Arial", 12), selectmode=tk.SINGLE)
-file_listbox.pack(fill=tk.BOTH, expand=True)
-file_listbox.bind("<<ListboxSelect>>", on_file_select)
-
-# Create a frame for the footer
-footer_frame = ttk.Frame(root, padding="10")
-footer_frame.pack(fill=tk.X)
-
-# Create a label for the footer
-footer_label = ttk.Label(footer_frame, text="Survival Resources Interface v1.0", font=("Arial", 10))
-footer_label.pack(side=tk.RIGHT, padx=5, pady=5)
-
-# Create a canvas for displaying PDF pages
-pdf_canvas = tk.Canvas(root, width=640, height=480, bg="black")
-pdf_canvas.pack()
-
-# Apply a custom style
-style = ttk.Style()
-style.theme_use('clam')
-style.configure("TFrame", background="#282c34", foreground="white")
-style.configure("TLabel", background="#282c34", foreground="white")
-style.configure("TCombobox", background="#282c34", foreground="white")
-style.configure("TButton", background="#282c34", foreground="white")
-
-# Set the initial category
-category_combobox.set("Medical")
-list_files("Medical")
-
-# Run the main loop
-root.mainloop()
+# Build the window only when run as a script, so the functions above can be imported
+if __name__ == "__main__":
+    # Create the main window
+    root = tk.Tk()
+    root.title("Survival Resources Interface")
+    root.geometry("800x600")
+
+    # Create a frame for the category selection
+    category_frame = ttk.Frame(root, padding="10")
+    category_frame.pack(fill=tk.X)
+
+    # Create a label for the category selection
+    category_label = ttk.Label(category_frame, text="Select Category:", font=("Arial", 14))
+    category_label.pack(side=tk.LEFT, padx=5, pady=5)
+
+    # Create a combobox for category selection
+    category_combobox = ttk.Combobox(category_frame, values=list(categories.keys()), font=("Arial", 14))
+    category_combobox.pack(side=tk.LEFT, padx=5, pady=5)
+    category_combobox.bind("<<ComboboxSelected>>", on_category_select)
+
+    # Create a search box for full-text search across all PDFs
+    search_label = ttk.Label(category_frame, text="Search:", font=("Arial", 14))
+    search_label.pack(side=tk.LEFT, padx=5, pady=5)
+    search_entry = ttk.Entry(category_frame, font=("Arial", 14))
+    search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
+    search_entry.bind("<KeyRelease>", on_search_key)
+
+    # Create a switch between the file list and the preview grid
+    show_previews = tk.BooleanVar(value=False)
+    previews_toggle = ttk.Checkbutton(category_frame, text="Previews", variable=show_previews, command=toggle_grid)
+    previews_toggle.pack(side=tk.LEFT, padx=5, pady=5)
+
+    # Create a frame for the file list
+    file_frame = ttk.Frame(root, padding="10")
+    file_frame.pack(fill=tk.BOTH, expand=True)
+
+    # Create a listbox for file display
+    file_listbox = tk.Listbox(file_frame, font=("Arial", 12), selectmode=tk.SINGLE)
+    file_listbox.pack(fill=tk.BOTH, expand=True)
+    file_listbox.bind("<<ListboxSelect>>", on_file_select)
+
+    # Create a scrollable canvas for the preview grid, shown instead of the listbox when enabled
+    grid_canvas = tk.Canvas(file_frame, bg="#282c34", highlightthickness=0,
+                            yscrollincrement=GRID_CELL_HEIGHT // 4)
+    grid_scrollbar = ttk.Scrollbar(file_frame, orient=tk.VERTICAL, command=grid_canvas.yview)
+    grid_canvas.config(yscrollcommand=on_grid_scroll)
+    grid_canvas.bind("<Configure>", lambda event: refresh_grid())
+    grid_canvas.bind("<Button-1>", on_grid_click)
+    grid_canvas.bind("<MouseWheel>", on_grid_mousewheel)
+    grid_canvas.bind("<Button-4>", on_grid_mousewheel)
+    grid_canvas.bind("<Button-5>", on_grid_mousewheel)
+
+    # Create a frame for the footer
+    footer_frame = ttk.Frame(root, padding="10")
+    footer_frame.pack(fill=tk.X)
+
+    # Create a label for the footer
+    footer_label = ttk.Label(footer_frame, text="Survival Resources Interface v1.0", font=("Arial", 10))
+    footer_label.pack(side=tk.RIGHT, padx=5, pady=5)
+
+    # Create a scrollable canvas for displaying PDF pages
+    pdf_frame = ttk.Frame(root)
+    pdf_frame.pack()
+    pdf_canvas = tk.Canvas(pdf_frame, width=640, height=480, bg="black")
+    pdf_scrollbar = ttk.Scrollbar(pdf_frame, orient=tk.VERTICAL, command=pdf_canvas.yview)
+    pdf_canvas.config(yscrollcommand=on_pdf_scroll)
+    pdf_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    pdf_canvas.pack(side=tk.LEFT)
+    pdf_canvas.bind("<Configure>", lambda event: update_visible_pages())
+    pdf_canvas.bind("<MouseWheel>", on_pdf_mousewheel)
+    pdf_canvas.bind("<Button-4>", on_pdf_mousewheel)
+    pdf_canvas.bind("<Button-5>", on_pdf_mousewheel)
+
+    # Start the page renderer
+    threading.Thread(target=render_worker, daemon=True).start()
+    root.after(30, poll_rendered_pages)
+    root.after(30, poll_listing_results)
+    root.after(500, poll_previews)
+
+    # Apply a custom style
+    style = ttk.Style()
+    style.theme_use('clam')
+    style.configure("TFrame", background="#282c34", foreground="white")
+    style.configure("TLabel", background="#282c34", foreground="white")
+    style.configure("TCombobox", background="#282c34", foreground="white")
+    style.configure("TButton", background="#282c34", foreground="white")
+
+    # Set the initial category, its files are listed once the window is on screen
+    category_combobox.set("Medical")
+    root.bind("<Map>", on_first_map)
+
+    # Run the main loop
+    root.mainloop()
+
+    # Make sure no ffmpeg or ffplay is left running after the window closes
+    stop_video()
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+from urllib.parse import parse_qs, urlparse
+
+# Stand-in for yt-dlp used by the benchmarks
+# Understands the options offgrid1.0.py passes: -o/--output, --download-archive and
+# --print after_move:<template>. Behaviour is tuned with environment variables:
+#   FAKE_YTDLP_DELAY  seconds spent "downloading" each item (default 0.1)
+#   FAKE_YTDLP_SIZE   bytes written per item (default 1024)
+#   FAKE_YTDLP_ITEMS  items in a non-YouTube playlist such as the archive (default 10)
+#   FAKE_YTDLP_FAIL_AFTER  exit with an error after fetching this many items, like a cut-off run
+#   FAKE_YTDLP_RUNNING  directory where every run leaves a marker while it is running and logs
+#                       how many runs it saw at once (running.log) and that it started (started.log)
+DELAY = float(os.environ.get("FAKE_YTDLP_DELAY", "0.1"))
+SIZE = int(os.environ.get("FAKE_YTDLP_SIZE", "1024"))
+ITEMS = int(os.environ.get("FAKE_YTDLP_ITEMS", "10"))
+FAIL_AFTER = int(os.environ.get("FAKE_YTDLP_FAIL_AFTER", "0"))
+RUNNING_DIR = os.environ.get("FAKE_YTDLP_RUNNING")
+
+# Titles for playlist items, so the archive classifier has something to match
+TITLES = ["Treating a deep wound", "Building a rabbit snare", "Planting a seed garden",
+          "Bow and arrow basics", "Camp vlog"]
+
+# Function to read the value following any of the given options
+def option(args, *names):
+    for name in names:
+        if name in args:
+            return args[args.index(name) + 1]
+    return None
+
+# Function to list the (extractor, id, title) items a URL stands for
+def items_for(url):
+    parsed = urlparse(url)
+    if "youtu" in parsed.netloc:
+        if parsed.path == "/watch":
+            video_id = parse_qs(parsed.query)["v"][0]
+        else:
+            video_id = parsed.path.rstrip("/").rsplit("/", 1)[-1]
+        return [("youtube", video_id, f"Video {video_id}")]
+    return [("archiveorg", f"item{i}", f"{TITLES[i % len(TITLES)]} {i}") for i in range(ITEMS)]
+
+# Function to append a line to one of the logs in RUNNING_DIR
+def log_running(name, line):
+    with open(os.path.join(RUNNING_DIR, name), "a") as file:
+        file.write(f"{line}\n")
+
+# Function to fetch the items of a URL like yt-dlp would
+def fetch(args):
+    url = args[-1]
+    template = option(args, "-o", "--output") or "%(title)s.%(ext)s"
+    archive = option(args, "--download-archive")
+    printed = option(args, "--print")
+    done = set()
+    if archive and os.path.exists(archive):
+        with open(archive) as file:
+            done = {line.strip() for line in file}
+
+    fetched = 0
+    for extractor, item_id, title in items_for(url):
+        if f"{extractor} {item_id}" in done:
+            continue
+        if FAIL_AFTER and fetched == FAIL_AFTER:
+            print("ERROR: connection reset", file=sys.stderr)
+            sys.exit(1)
+        fetched += 1
+        time.sleep(DELAY)
+        if RUNNING_DIR:
+            # Counted at the end of a "download", while every overlapping run is still going
+            log_running("running.log", sum(1 for name in os.listdir(RUNNING_DIR) if name.endswith(".running")))
+        path = template.replace("%(title)s", title).replace("%(ext)s", "mp4")
+        with open(path, "wb") as file:
+            file.write(b"\0" * SIZE)
+        if archive:
+            with open(archive, "a") as file:
+                file.write(f"{extractor} {item_id}\n")
+        if printed and printed.endswith("j"):
+            info = {"filepath": path, "id": item_id, "extractor_key": extractor.capitalize(), "title": title, "tags": [], "description": ""}
+            print(json.dumps(info), flush=True)
+        elif printed:
+            print(path, flush=True)
+
+def main(args):
+    if not RUNNING_DIR:
+        return fetch(args)
+    marker = os.path.join(RUNNING_DIR, f"{os.getpid()}.running")
+    open(marker, "w").close()
+    log_running("started.log", os.getpid())
+    try:
+        fetch(args)
+    finally:
+        os.remove(marker)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
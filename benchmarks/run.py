@@ -0,0 +1,471 @@
+import os
+import sys
+import argparse
+import contextlib
+import errno
+import importlib.util
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import stand_ins
+
+# Benchmarks for the provisioning scripts and the interface
+# Every suite runs in its own temporary directory against local stand-ins
+# (HTTP server, fake yt-dlp, a file:// git repository, a --serve node, generated
+# trees, PDFs and test clips) and the results are written as JSON so runs can be
+# compared over time:
+#   python benchmarks/run.py --output results.json
+#   python benchmarks/run.py --suite download --latency 0.5
+# Suites also check the behaviour they measure (a sync with nothing new touches no
+# files, for example), and the run exits with status 1 if any check fails.
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUITES = ["download", "refresh", "youtube", "github", "peer_sync", "transcode", "check_files_exist", "list_files", "pdf", "ui_startup"]
+
+# Modules the interface should only load once a PDF or video is opened
+HEAVY_MODULES = ["fitz", "PIL", "pygame"]
+
+# Loads the interface in a fresh interpreter and reports how long that took and what it pulled in
+UI_STARTUP_PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("ui", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "loaded": [name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+# Function to load one of the repository's scripts as a fresh module
+# Scripts create BASE_DIR relative to the working directory, so this changes into
+# workdir first to keep everything they write inside it.
+def load_script(filename, workdir):
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    name = os.path.splitext(filename)[0].replace(".", "_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(REPO_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        spec.loader.exec_module(module)
+    return module
+
+# Function to check that the commands a suite runs are installed
+# A missing one raises FileNotFoundError, which reports the suite as skipped.
+def require_commands(*commands):
+    for command in commands:
+        if shutil.which(command) is None:
+            raise FileNotFoundError(errno.ENOENT, "command not found", command)
+
+# Function to snapshot the inode and mtime of every file in the library outside its hidden
+# and state files, to count how many files an operation actually rewrote
+def library_snapshot(base_dir, skip=()):
+    snapshot = {}
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and os.path.join(root, d) not in skip]
+        for name in files:
+            if not name.startswith(".") and not name.endswith(".jsonl"):
+                stat = os.stat(os.path.join(root, name))
+                snapshot[os.path.join(root, name)] = (stat.st_ino, stat.st_mtime_ns)
+    return snapshot
+
+# Function to count the files added, removed or rewritten between two snapshots
+def files_touched(before, after):
+    return sum(1 for path in before.keys() | after.keys() if before.get(path) != after.get(path))
+
+# Function to record whether a suite's result meets an expectation
+def expect(results, name, passed):
+    results.setdefault("checks", {})[name] = bool(passed)
+
+# Function to list the checks that failed in a report, as suite.check names
+def failed_checks(report):
+    return [f"{suite}.{name}" for suite, results in report["results"].items() if isinstance(results, dict)
+            for name, passed in results.get("checks", {}).items() if not passed]
+
+# Function to time a call with the scripts' progress output silenced
+def timed(function, *args, **kwargs):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        return time.perf_counter() - start, result
+
+# download_pdfs/download_file against a local server: scaling with workers and Range resume
+def bench_download(args, workdir):
+    files = {f"/manual{i}.pdf": stand_ins.synthetic_pdf_bytes(args.size, seed=i) for i in range(args.files)}
+    server, base_url = stand_ins.start_file_server(files, latency=args.latency)
+    total_bytes = sum(len(body) for body in files.values())
+    results = {"files": args.files, "bytes_per_file": args.size, "latency_s": args.latency, "workers": []}
+
+    baseline = None
+    for workers in args.workers:
+        offgrid = load_script("offgrid1.0.py", os.path.join(workdir, f"workers{workers}"))
+        offgrid.MAX_PER_HOST = workers
+        offgrid.resources = [{"url": base_url + path, "filename": path.lstrip("/")} for path in files]
+        jobs = [(r["url"], os.path.join(offgrid.BASE_DIR, r["filename"])) for r in offgrid.resources]
+        seconds, summary = timed(offgrid.download_many, jobs, max_workers=workers)
+        baseline = baseline or seconds
+        results["workers"].append({
+            "workers": workers,
+            "seconds": seconds,
+            "bytes_per_sec": total_bytes / seconds,
+            "speedup": baseline / seconds,
+            "failed": len(summary["failed"]),
+        })
+
+    # Resume a transfer that was cut off halfway through
+    offgrid = load_script("offgrid1.0.py", os.path.join(workdir, "resume"))
+    path, body = next(iter(files.items()))
+    save_path = os.path.join(offgrid.BASE_DIR, path.lstrip("/"))
+    with open(save_path + ".part", "wb") as file:
+        file.write(body[:len(body) // 2])
+    sent_before = server.bytes_sent
+    seconds, status = timed(offgrid.download_file, base_url + path, save_path)
+    results["resume"] = {"seconds": seconds, "status": status, "bytes_fetched": server.bytes_sent - sent_before,
+                         "bytes_total": len(body)}
+    server.shutdown()
+    return results
+
+# refresh_resources against a local server: cost of a no-change refresh and of one changed file
+def bench_refresh(args, workdir):
+    files = {f"/manual{i}.pdf": stand_ins.synthetic_pdf_bytes(args.size, seed=i) for i in range(args.files)}
+    server, base_url = stand_ins.start_file_server(files, latency=args.latency)
+    offgrid = load_script("offgrid1.0.py", workdir)
+    offgrid.resources = [{"url": base_url + path, "filename": path.lstrip("/")} for path in files]
+    timed(offgrid.download_pdfs)
+
+    results = {"files": args.files, "bytes_per_file": args.size, "latency_s": args.latency}
+    for case in ("unchanged", "one_changed"):
+        if case == "one_changed":
+            files["/manual0.pdf"] = stand_ins.synthetic_pdf_bytes(args.size, seed=-1)
+        requests_before, sent_before = server.requests, server.bytes_sent
+        seconds, statuses = timed(offgrid.refresh_resources)
+        results[case] = {
+            "seconds": seconds,
+            "requests": server.requests - requests_before,
+            "body_bytes": server.bytes_sent - sent_before,
+            "changed": sum(1 for status in statuses.values() if status == "changed"),
+        }
+    server.shutdown()
+    return results
+
+# download_youtube_videos with a fake yt-dlp: scaling with workers and ledger skip rate
+def bench_youtube(args, workdir):
+    running_dir = os.path.join(workdir, "running")
+    stand_ins.install_fake_yt_dlp(os.path.join(workdir, "bin"), delay=args.video_delay, running_dir=running_dir)
+    results = {"videos": args.videos, "delay_s": args.video_delay, "workers": []}
+    for workers in args.workers:
+        offgrid = load_script("offgrid1.0.py", os.path.join(workdir, f"workers{workers}"))
+        offgrid.categories = {"Bench": [f"https://www.youtube.com/watch?v=vid{i:05d}" for i in range(args.videos)]}
+        seconds, _ = timed(offgrid.download_youtube_videos, workers)
+        peak = max(read_log(running_dir, "running.log"), default=0)
+        clear_logs(running_dir)
+        rerun_seconds, rerun = timed(offgrid.download_youtube_videos, workers)
+        rerun_started = len(read_log(running_dir, "started.log"))
+        clear_logs(running_dir)
+        skipped = sum(1 for status, _ in rerun.values() if status == "skipped")
+        results["workers"].append({
+            "workers": workers,
+            "seconds": seconds,
+            "peak_processes": peak,
+            "rerun_seconds": rerun_seconds,
+            "rerun_skip_rate": skipped / args.videos,
+            "rerun_processes": rerun_started,
+        })
+    expect(results, "processes_within_workers", all(run["peak_processes"] <= run["workers"] for run in results["workers"]))
+    expect(results, "rerun_skips_every_video", all(run["rerun_skip_rate"] == 1.0 for run in results["workers"]))
+    expect(results, "rerun_starts_no_process", all(run["rerun_processes"] == 0 for run in results["workers"]))
+    return results
+
+# Function to read the numbers a fake yt-dlp logged in its running directory
+def read_log(running_dir, name):
+    path = os.path.join(running_dir, name)
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [int(line) for line in file if line.strip()]
+
+# Function to empty the fake yt-dlp's logs between runs
+def clear_logs(running_dir):
+    for name in ("running.log", "started.log"):
+        if os.path.exists(os.path.join(running_dir, name)):
+            os.remove(os.path.join(running_dir, name))
+
+# download_github_pdfs against a local file:// bare repository: files placed by the first
+# sync, by a sync with nothing new, and by a sync after a one-file commit
+def bench_github(args, workdir):
+    require_commands("git")
+    results = {"repo_files": args.repo_files}
+    repo_url = stand_ins.make_git_repo(os.path.join(workdir, "remote"), args.repo_files)
+    offgrid = load_script("offgrid1.0.py", os.path.join(workdir, "library"))
+    offgrid.GITHUB_REPO = repo_url
+    clone = os.path.join(offgrid.BASE_DIR, "HOME")
+    for case in ("first_sync", "no_change", "one_changed"):
+        if case == "one_changed":
+            stand_ins.commit_git_change(os.path.join(workdir, "remote"), "pdfs/dir00000/file000000.pdf",
+                                        stand_ins.synthetic_pdf_bytes(4096, seed=1))
+        before = library_snapshot(offgrid.BASE_DIR, skip=(clone,))
+        seconds, _ = timed(offgrid.download_github_pdfs)
+        after = library_snapshot(offgrid.BASE_DIR, skip=(clone,))
+        results[case] = {"seconds": seconds, "files_touched": files_touched(before, after),
+                         "library_files": len(after)}
+    expect(results, "first_sync_places_every_file", results["first_sync"]["library_files"] == args.repo_files)
+    expect(results, "no_change_touches_nothing", results["no_change"]["files_touched"] == 0)
+    expect(results, "one_changed_touches_one_file", results["one_changed"]["files_touched"] == 1)
+    return results
+
+# sync_from_peers between two libraries on localhost: the first pull, a resync with nothing
+# new, a resync after one file changed on the serving node, and a pull of a file the node
+# serves with a corrupted piece, which the piece hashes must reject
+def bench_peer_sync(args, workdir):
+    seeder_dir = os.path.join(workdir, "seeder")
+    seeder = load_script("offgrid1.0.py", seeder_dir)
+    paths = []
+    for i in range(args.files):
+        path = os.path.join(seeder.BASE_DIR, "Bench", f"manual{i}.pdf")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(stand_ins.synthetic_pdf_bytes(args.size, seed=i))
+        seeder.manifest_record(f"http://bench.invalid/manual{i}.pdf", path)
+        paths.append(path)
+    node, node_url = stand_ins.start_peer_node(os.path.join(REPO_DIR, "offgrid1.0.py"), seeder_dir)
+
+    results = {"files": args.files, "bytes_per_file": args.size, "workers": max(args.workers)}
+    try:
+        offgrid = load_script("offgrid1.0.py", os.path.join(workdir, "puller"))
+        for case in ("first_sync", "no_change", "one_changed", "corrupt_piece"):
+            if case == "one_changed":
+                os.chdir(seeder_dir)
+                with open(paths[0], "wb") as file:
+                    file.write(stand_ins.synthetic_pdf_bytes(args.size, seed=-1))
+                seeder.manifest_record("http://bench.invalid/manual0.pdf", paths[0])
+                os.chdir(os.path.join(workdir, "puller"))
+            if case == "corrupt_piece":
+                # Damage the node's copy behind its back: size, mtime and the recorded hashes stay the same
+                stat = os.stat(os.path.join(seeder_dir, paths[1]))
+                with open(os.path.join(seeder_dir, paths[1]), "r+b") as file:
+                    file.seek(stat.st_size // 2)
+                    file.write(b"\xff" * 16)
+                os.utime(os.path.join(seeder_dir, paths[1]), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                os.remove(paths[1])
+            before = library_snapshot(offgrid.BASE_DIR)
+            seconds, summary = timed(offgrid.sync_from_peers, [node_url], max(args.workers))
+            after = library_snapshot(offgrid.BASE_DIR)
+            results[case] = {
+                "seconds": seconds,
+                "pulled": len(summary["downloaded"]),
+                "present": len(summary["present"]),
+                "failed": len(summary["failed"]),
+                "files_touched": files_touched(before, after),
+            }
+        results["corrupt_piece"]["accepted"] = os.path.exists(paths[1])
+    finally:
+        node.terminate()
+        node.wait()
+    expect(results, "first_sync_pulls_every_file", results["first_sync"]["pulled"] == args.files)
+    expect(results, "no_change_pulls_nothing", results["no_change"]["pulled"] == 0)
+    expect(results, "one_changed_pulls_one_file", results["one_changed"]["pulled"] == 1)
+    expect(results, "corrupt_piece_is_rejected",
+           results["corrupt_piece"]["failed"] == 1 and not results["corrupt_piece"]["accepted"])
+    return results
+
+# transcode_videos on synthetic test clips: scaling with workers, space saved and ledger skips on a rerun
+def bench_transcode(args, workdir):
+    require_commands("ffmpeg", "ffprobe")
+    clips = [os.path.join(workdir, "clips", f"clip{i}.mkv") for i in range(args.clips)]
+    for clip in clips:
+        stand_ins.make_test_clip(clip, args.clip_seconds)
+    results = {"clips": args.clips, "clip_seconds": args.clip_seconds, "workers": []}
+
+    baseline = None
+    for workers in args.workers:
+        offgrid = load_script("offgrid1.0.py", os.path.join(workdir, f"workers{workers}"))
+        os.makedirs(os.path.join(offgrid.BASE_DIR, "Bench"), exist_ok=True)
+        for clip in clips:
+            path = os.path.join(offgrid.BASE_DIR, "Bench", os.path.basename(clip))
+            shutil.copy2(clip, path)
+            offgrid.manifest_record("http://bench.invalid/" + os.path.basename(clip), path)
+        bytes_before = sum(os.path.getsize(path) for path in library_snapshot(offgrid.BASE_DIR))
+        seconds, counts = timed(offgrid.transcode_videos, None, workers)
+        bytes_after = sum(os.path.getsize(path) for path in library_snapshot(offgrid.BASE_DIR))
+        rerun_seconds, rerun = timed(offgrid.transcode_videos, None, workers)
+        baseline = baseline or seconds
+        results["workers"].append({
+            "workers": workers,
+            "seconds": seconds,
+            "speedup": baseline / seconds,
+            "transcoded": counts["transcoded"],
+            "failed": counts["failed"],
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "rerun_seconds": rerun_seconds,
+            "rerun_transcoded": rerun["transcoded"],
+            # Videos the rerun looked at at all; the ledger should leave it nothing to probe or encode
+            "rerun_handled": sum(rerun.values()),
+        })
+    expect(results, "every_clip_transcoded", all(run["transcoded"] == args.clips for run in results["workers"]))
+    expect(results, "library_shrinks", all(run["bytes_after"] < run["bytes_before"] for run in results["workers"]))
+    expect(results, "rerun_transcodes_nothing", all(run["rerun_transcoded"] == 0 for run in results["workers"]))
+    expect(results, "rerun_skips_every_video", all(run["rerun_handled"] == 0 for run in results["workers"]))
+    return results
+
+# check_files_exist and verify_manifest over generated trees, against the old os.walk scan
+def bench_check_files_exist(args, workdir):
+    results = []
+    for count in args.tree_sizes:
+        offgrid = load_script("offgrid1.0.py", os.path.join(workdir, f"tree{count}"))
+        paths = stand_ins.make_library_tree(os.path.join(offgrid.BASE_DIR, "HOME"), count)
+        offgrid.resources, offgrid.categories = [], {}
+        db = offgrid.get_manifest()
+        rows = []
+        for path in paths:
+            stat = os.stat(path)
+            rows.append((os.path.normpath(path), offgrid.GITHUB_REPO, stat.st_size, stat.st_mtime_ns, "0" * 64))
+        archive_path = os.path.join(offgrid.BASE_DIR, "archive.mp4")
+        open(archive_path, "wb").close()
+        stat = os.stat(archive_path)
+        rows.append((archive_path, offgrid.ARCHIVE_URL, stat.st_size, stat.st_mtime_ns, "0" * 64))
+        db.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?)", rows)
+        db.commit()
+
+        walk_seconds, _ = timed(lambda: sum(len(files) for _, _, files in os.walk(offgrid.BASE_DIR)))
+        check_seconds, complete = timed(offgrid.check_files_exist)
+        verify_seconds, _ = timed(offgrid.verify_manifest)
+        results.append({
+            "files": count,
+            "os_walk_seconds": walk_seconds,
+            "check_files_exist_seconds": check_seconds,
+            "verify_manifest_seconds": verify_seconds,
+            "complete": complete,
+        })
+    return results
+
+# The interface's background directory scan and its cached revalidation
+def bench_list_files(args, workdir):
+    ui = load_script("UIoffgrid1.0.py", os.path.join(workdir, "ui"))
+    results = []
+    for count in args.tree_sizes:
+        tree = os.path.join(workdir, f"listing{count}")
+        stand_ins.make_library_tree(tree, count)
+        scan_seconds, (dir_mtimes, paths) = timed(ui.scan_directory, tree)
+        revalidate_seconds, _ = timed(lambda: all(ui.dir_mtime(d) == m for d, m in dir_mtimes.items()))
+        results.append({
+            "files": count,
+            "scan_seconds": scan_seconds,
+            "cached_revalidate_seconds": revalidate_seconds,
+            "listed": len(paths),
+        })
+    return results
+
+# display_pdf's first-page latency against rendering every page up front
+def bench_pdf(args, workdir):
+    import fitz  # PyMuPDF for PDFs
+
+    ui = load_script("UIoffgrid1.0.py", os.path.join(workdir, "ui"))
+    results = []
+    for pages in args.pdf_pages:
+        path = os.path.join(workdir, f"synthetic{pages}.pdf")
+        stand_ins.make_pdf(path, pages)
+
+        def first_page():
+            with fitz.open(path) as doc:
+                ui.layout_pdf(doc)
+                ui.render_page(doc, 0, ui.PDF_ZOOM)
+
+        def all_pages():
+            with fitz.open(path) as doc:
+                for page_num in range(len(doc)):
+                    ui.render_page(doc, page_num, ui.PDF_ZOOM)
+
+        first_seconds, _ = timed(first_page)
+        result = {"pages": pages, "first_page_seconds": first_seconds}
+        if args.full_render:
+            result["all_pages_seconds"], _ = timed(all_pages)
+        results.append(result)
+    return results
+
+# Cost of loading the interface module in a fresh interpreter, before any window work
+def bench_ui_startup(args, workdir):
+    os.makedirs(workdir, exist_ok=True)
+    runs = []
+    for _ in range(args.startup_runs):
+        probe = subprocess.run([sys.executable, "-c", UI_STARTUP_PROBE, os.path.join(REPO_DIR, "UIoffgrid1.0.py"),
+                                *HEAVY_MODULES], cwd=workdir, capture_output=True, text=True,
+                               env=dict(os.environ, PYTHONPATH=REPO_DIR))
+        if probe.returncode != 0:
+            raise RuntimeError(f"UI import failed: {probe.stderr.strip()}")
+        runs.append(json.loads(probe.stdout.splitlines()[-1]))
+    seconds = sorted(run["seconds"] for run in runs)
+    return {
+        "runs": len(runs),
+        "import_seconds_median": seconds[len(seconds) // 2],
+        "import_seconds_min": seconds[0],
+        "heavy_modules_loaded": runs[-1]["loaded"],
+    }
+
+# Function to parse a comma separated list of integers
+def int_list(text):
+    return [int(value) for value in text.split(",") if value]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offgrid download and interface paths.")
+    parser.add_argument("--suite", action="append", choices=SUITES,
+                        help="suite to run, may be repeated (default: all)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--files", type=int, default=16, help="files served to the download suite")
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="bytes per served file")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the server answers")
+    parser.add_argument("--workers", type=int_list, default=[1, 2, 4, 8], help="worker counts to compare")
+    parser.add_argument("--videos", type=int, default=12, help="videos fed to the fake yt-dlp")
+    parser.add_argument("--video-delay", type=float, default=0.2, help="seconds the fake yt-dlp spends per video")
+    parser.add_argument("--repo-files", type=int, default=2000, help="files in the github suite's repository")
+    parser.add_argument("--clips", type=int, default=4, help="test clips made for the transcode suite")
+    parser.add_argument("--clip-seconds", type=int, default=3, help="length of each test clip")
+    parser.add_argument("--tree-sizes", type=int_list, default=[1000, 10000],
+                        help="library sizes to generate, e.g. 1000,10000,100000")
+    parser.add_argument("--pdf-pages", type=int_list, default=[100, 600], help="page counts of the synthetic PDFs")
+    parser.add_argument("--full-render", action="store_true", help="also time rendering every page of each PDF")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters timed by the ui_startup suite")
+    args = parser.parse_args()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("suite", "output")},
+        "results": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="offgrid-bench-")
+    cwd = os.getcwd()
+    try:
+        for suite in args.suite or SUITES:
+            print(f"Running {suite} benchmark...", file=sys.stderr)
+            try:
+                report["results"][suite] = globals()[f"bench_{suite}"](args, os.path.join(workdir, suite))
+            except ImportError as e:
+                report["results"][suite] = {"skipped": f"missing dependency: {e.name}"}
+            except FileNotFoundError as e:
+                report["results"][suite] = {"skipped": f"missing command: {e.filename}"}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    failed = failed_checks(report)
+    if failed:
+        print(f"Failed checks: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import sys
+import random
+import socket
+import subprocess
+import threading
+import time
+import urllib.request
+import zlib
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the remote services and library contents the benchmarks exercise
+
+FAKE_YT_DLP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_yt_dlp.py")
+
+# Function to build the bytes of a synthetic PDF download of a given size
+def synthetic_pdf_bytes(size, seed=0):
+    header = b"%PDF-1.4\n"
+    return header + random.Random(seed).randbytes(max(size - len(header), 0))
+
+# Serves the files dict of its server with keep-alive, Range requests, ETag /
+# Last-Modified validators (answering If-None-Match with 304) and a fixed latency
+class SyntheticFileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        self.server.requests += 1
+        time.sleep(self.server.latency)
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = f'"{zlib.crc32(body):08x}-{len(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start, end = 0, len(body) - 1
+        byte_range = self.headers.get("Range", "")
+        if byte_range.startswith("bytes="):
+            first, _, last = byte_range[len("bytes="):].partition("-")
+            start = int(first or 0)
+            end = min(int(last), end) if last else end
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.server.last_modified)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body[start:end + 1])
+            self.server.bytes_sent += end - start + 1
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to start a file server on a free localhost port in a background thread
+# files maps URL paths such as "/manual.pdf" to their bytes.
+def start_file_server(files, latency=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SyntheticFileHandler)
+    server.daemon_threads = True
+    server.files = files
+    server.latency = latency
+    server.requests = 0
+    server.bytes_sent = 0
+    server.last_modified = formatdate(usegmt=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+# Function to pick a localhost port that nothing is listening on
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Function to run offgrid1.0.py --serve from a library's directory in its own process
+# Returns the process and the node's base URL once the node answers for its manifest.
+def start_peer_node(script, workdir, timeout=30):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, script, "--serve", "--port", str(port)], cwd=workdir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(base_url + "/manifest", timeout=1).close()
+            return process, base_url
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                raise RuntimeError(f"peer node in {workdir} did not start serving")
+            time.sleep(0.1)
+
+# Function to put a yt-dlp command backed by fake_yt_dlp.py first on PATH
+# With running_dir, every run logs its concurrency there (see fake_yt_dlp.py).
+def install_fake_yt_dlp(bin_dir, delay=0.1, size=1024, items=10, running_dir=None):
+    os.makedirs(bin_dir, exist_ok=True)
+    if os.name == "nt":
+        with open(os.path.join(bin_dir, "yt-dlp.bat"), "w") as file:
+            file.write(f'@"{sys.executable}" "{FAKE_YT_DLP}" %*\n')
+    else:
+        shim = os.path.join(bin_dir, "yt-dlp")
+        with open(shim, "w") as file:
+            file.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_YT_DLP}" "$@"\n')
+        os.chmod(shim, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+    os.environ["FAKE_YTDLP_DELAY"] = str(delay)
+    os.environ["FAKE_YTDLP_SIZE"] = str(size)
+    os.environ["FAKE_YTDLP_ITEMS"] = str(items)
+    if running_dir:
+        os.makedirs(running_dir, exist_ok=True)
+        os.environ["FAKE_YTDLP_RUNNING"] = running_dir
+    else:
+        os.environ.pop("FAKE_YTDLP_RUNNING", None)
+
+# Function to generate a library tree of small files, files_per_dir to a directory
+def make_library_tree(base_dir, count, files_per_dir=100):
+    paths = []
+    for i in range(count):
+        directory = os.path.join(base_dir, f"dir{i // files_per_dir:05d}")
+        if i % files_per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{i:06d}.pdf")
+        with open(path, "wb") as file:
+            file.write(b"%PDF-1.4\n")
+        paths.append(path)
+    return paths
+
+# Function to write a synthetic multi-page PDF with a little text on every page
+def make_pdf(path, pages):
+    import fitz  # PyMuPDF for PDFs
+
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((72, 72 + line * 16), f"Page {page_num + 1} line {line + 1}: boil water before drinking")
+    doc.save(path)
+    doc.close()
+
+# Function to write a synthetic 720p test clip with a tone, encoded well above the storage profile
+def make_test_clip(path, seconds):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+                    "-f", "lavfi", "-i", f"testsrc=size=1280x720:rate=25:duration={seconds}",
+                    "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+                    "-c:v", "libx264", "-b:v", "4M", "-preset", "ultrafast", "-c:a", "aac", "-b:a", "192k", path],
+                   check=True)
+
+# Function to run git quietly with a fixed identity, so commits work where none is configured
+def run_git(*args):
+    subprocess.run(["git", "-c", "user.name=offgrid-bench", "-c", "user.email=bench@localhost", *args],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+# Function to create a bare repository holding count small PDFs and return its file:// URL
+# The work tree it was pushed from is kept next to it for commit_git_change().
+def make_git_repo(base_dir, count):
+    work, bare = os.path.join(base_dir, "work"), os.path.join(base_dir, "repo.git")
+    make_library_tree(os.path.join(work, "pdfs"), count)
+    run_git("init", "--quiet", work)
+    run_git("-C", work, "add", "--all")
+    run_git("-C", work, "commit", "--quiet", "-m", "Add the library")
+    run_git("clone", "--quiet", "--bare", work, bare)
+    return "file://" + os.path.abspath(bare)
+
+# Function to commit new contents for one file of a make_git_repo() repository and push it
+def commit_git_change(base_dir, path, body):
+    work, bare = os.path.join(base_dir, "work"), os.path.join(base_dir, "repo.git")
+    with open(os.path.join(work, path), "wb") as file:
+        file.write(body)
+    run_git("-C", work, "commit", "--quiet", "--all", "-m", f"Update {path}")
+    run_git("-C", work, "push", "--quiet", bare, "HEAD")
@@ -0,0 +1,260 @@
+import os
+import argparse
+import hashlib
+import shutil
+import sqlite3
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+# Folder where all resources are saved
+BASE_DIR = "offline_survival_resources"
+
+# Content-addressed store shared by the library and the package caches
+# Every distinct file is kept once, as objects/<first two hex digits>/<sha256>, and every
+# place it appears in a tree is a hardlink (a "view") to that blob. A blob is referenced
+# for as long as it has a view, so its link count is all garbage collection needs.
+STORE_DIR = os.path.join(BASE_DIR, ".blobs")
+HASH_WORKERS = os.cpu_count() or 4
+
+# Files that are rewritten in place are never ingested: as read-only views of a blob they
+# would break their writers, and anything written through them would change every view.
+# This covers dotfiles (the manifest, search index and yt-dlp ledger), databases and their
+# journals, the metrics log, and downloads, syncs and transcodes still in progress.
+MUTABLE_SUFFIXES = (".sqlite", ".sqlite-wal", ".sqlite-shm", "-journal", ".jsonl",
+                    ".part", ".tmp", ".offgrid-tmp", ".blob-tmp")
+# Package repository indexes, regenerated by the package scripts on every run:
+# apt's Packages.gz, Release and friends, and pacman's repo-add databases
+REPO_INDEX_NAMES = ("Packages", "Sources", "Release", "InRelease")
+REPO_INDEX_SUFFIXES = (".db", ".db.tar.gz", ".db.tar.zst", ".files", ".files.tar.gz", ".files.tar.zst",
+                       ".old", ".lck")
+
+# Function to get the paths of the store's objects directory and index
+def store_paths(store):
+    return os.path.join(store, "objects"), os.path.join(store, "index.sqlite")
+
+# Function to create a store directory
+# When run through sudo (as the package scripts do) the directory is handed back to the
+# invoking user, so the same store can still be used without sudo afterwards.
+def make_dir(path):
+    if os.path.isdir(path):
+        return
+    os.makedirs(path, exist_ok=True)
+    if os.geteuid() == 0 and "SUDO_UID" in os.environ:
+        os.chown(path, int(os.environ["SUDO_UID"]), int(os.environ["SUDO_GID"]))
+
+# Function to open (and create if needed) a store
+# The index maps the inode of every blob to its hash, so views are recognised without hashing them.
+def open_store(store=STORE_DIR):
+    objects, index_path = store_paths(store)
+    make_dir(store)
+    make_dir(objects)
+    db = sqlite3.connect(index_path, check_same_thread=False)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            dev INTEGER NOT NULL,
+            ino INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        )""")
+    db.execute("CREATE UNIQUE INDEX IF NOT EXISTS blobs_inode ON blobs (dev, ino)")
+    db.commit()
+    if os.geteuid() == 0 and "SUDO_UID" in os.environ:
+        os.chown(index_path, int(os.environ["SUDO_UID"]), int(os.environ["SUDO_GID"]))
+    return db
+
+# Function to get where a blob lives in the store
+def blob_path(store, sha256):
+    return os.path.join(store_paths(store)[0], sha256[:2], sha256)
+
+# Function to hash a file without loading it into memory
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to hash a file for ingest, returning None (and saying why) if it cannot be read
+def safe_sha256(path):
+    try:
+        return file_sha256(path)
+    except OSError as e:
+        print(f"Failed to hash {path}. Error: {e}")
+        return None
+
+# Function to check whether a file is one that gets rewritten in place
+def is_mutable(name):
+    return (name.startswith(".") or name.endswith(MUTABLE_SUFFIXES) or ".transcode-tmp." in name
+            or name.split(".")[0] in REPO_INDEX_NAMES or name.endswith(REPO_INDEX_SUFFIXES))
+
+# Function to list the regular files under the given paths that are safe to ingest
+# Hidden directories such as .git and the store itself are skipped, and so are mutable files.
+def find_files(paths, store):
+    store = os.path.abspath(store)
+    for path in paths:
+        if os.path.isfile(path):
+            if not os.path.islink(path) and not is_mutable(os.path.basename(path)):
+                yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and os.path.abspath(os.path.join(root, d)) != store]
+            for name in files:
+                file_path = os.path.join(root, name)
+                if not os.path.islink(file_path) and not is_mutable(name):
+                    yield file_path
+
+# Function to check whether a file is already a view of a blob in the store
+def known_blob(db, store, file_stat):
+    row = db.execute("SELECT sha256 FROM blobs WHERE dev = ? AND ino = ?", (file_stat.st_dev, file_stat.st_ino)).fetchone()
+    if row is None:
+        return None
+    try:
+        blob_stat = os.stat(blob_path(store, row[0]))
+    except OSError:
+        return None
+    # Inode numbers are reused after garbage collection, so check the blob really is this inode
+    return row[0] if (blob_stat.st_dev, blob_stat.st_ino) == (file_stat.st_dev, file_stat.st_ino) else None
+
+# Function to turn one hashed file into a view of its blob, returning the bytes this freed
+# A file with new content becomes the blob itself (a hardlink, nothing is copied). A file
+# whose content is already stored is swapped for a hardlink to the blob with os.replace.
+def link_into_store(db, store, path, file_stat, sha256):
+    current = os.stat(path)
+    if (current.st_size, current.st_mtime_ns, current.st_ino) != (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino):
+        raise IOError("changed while it was being hashed")
+    blob = blob_path(store, sha256)
+    try:
+        blob_stat = os.stat(blob)
+    except FileNotFoundError:
+        make_dir(os.path.dirname(blob))
+        os.link(path, blob)
+        # Views share the blob's inode, so writing one in place would change them all
+        os.chmod(blob, stat.S_IMODE(current.st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+        db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)", (sha256, current.st_dev, current.st_ino, current.st_size))
+        return 0
+    if blob_stat.st_ino == current.st_ino:
+        return 0
+    tmp = path + ".blob-tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.link(blob, tmp)
+    os.replace(tmp, path)
+    # The old copy's bytes are only freed if nothing else linked to it
+    return current.st_size if current.st_nlink == 1 else 0
+
+# Function to ingest trees into the store, deduplicating identical files
+# Files are hashed in parallel, once per inode, and files that are already views are not hashed at all.
+def ingest(paths, store=STORE_DIR, workers=HASH_WORKERS):
+    db = open_store(store)
+    store_dev = os.stat(store).st_dev
+    inodes, skipped = {}, 0
+    for path in find_files(paths, store):
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            continue
+        if file_stat.st_size == 0:
+            continue
+        if file_stat.st_dev != store_dev:
+            # Hardlinks cannot cross filesystems
+            skipped += 1
+            continue
+        if known_blob(db, store, file_stat) is None:
+            inodes.setdefault((file_stat.st_dev, file_stat.st_ino), []).append((path, file_stat))
+
+    todo = list(inodes.values())
+    print(f"Hashing {len(todo)} files with {workers} workers...")
+    reclaimed = linked = failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = pool.map(lambda views: safe_sha256(views[0][0]), todo)
+        for views, sha256 in zip(todo, hashes):
+            if sha256 is None:
+                failed += len(views)
+                continue
+            for path, file_stat in views:
+                try:
+                    reclaimed += link_into_store(db, store, path, file_stat, sha256)
+                    linked += 1
+                except OSError as e:
+                    failed += 1
+                    print(f"Failed to link {path} into the store. Error: {e}")
+            db.commit()
+    print(f"Ingested {linked} files, {failed} failed, {skipped} on another filesystem: "
+          f"{reclaimed / 1e6:.1f} MB reclaimed")
+    return reclaimed
+
+# Function to ingest files and place a view of each into a directory, in place of cp
+def link_files(sources, dest_dir, store=STORE_DIR, workers=HASH_WORKERS):
+    ingest(sources, store, workers)
+    make_dir(dest_dir)
+    for source in sources:
+        dst = os.path.join(dest_dir, os.path.basename(source))
+        tmp = dst + ".blob-tmp"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(source, tmp)
+        except OSError:
+            # Different filesystem, or a file the store could not take
+            shutil.copy2(source, tmp)
+        os.replace(tmp, dst)
+    print(f"Linked {len(sources)} files into {dest_dir}")
+
+# Function to delete blobs that no view refers to any more, returning the bytes freed
+def collect_garbage(store=STORE_DIR):
+    db = open_store(store)
+    objects = store_paths(store)[0]
+    freed = removed = 0
+    for prefix in os.listdir(objects):
+        for name in os.listdir(os.path.join(objects, prefix)):
+            path = os.path.join(objects, prefix, name)
+            blob_stat = os.stat(path)
+            if blob_stat.st_nlink == 1:
+                os.remove(path)
+                db.execute("DELETE FROM blobs WHERE sha256 = ?", (name,))
+                freed += blob_stat.st_size
+                removed += 1
+    db.commit()
+    print(f"Removed {removed} unreferenced blobs: {freed / 1e6:.1f} MB reclaimed")
+    return freed
+
+# Function to report how much space the store is saving
+def store_stats(store=STORE_DIR):
+    objects = store_paths(store)[0]
+    blobs = views = stored = logical = 0
+    for prefix in os.listdir(objects) if os.path.isdir(objects) else []:
+        for name in os.listdir(os.path.join(objects, prefix)):
+            blob_stat = os.stat(os.path.join(objects, prefix, name))
+            blobs += 1
+            views += blob_stat.st_nlink - 1
+            stored += blob_stat.st_size
+            logical += blob_stat.st_size * (blob_stat.st_nlink - 1)
+    print(f"{blobs} blobs ({stored / 1e6:.1f} MB) behind {views} files ({logical / 1e6:.1f} MB): "
+          f"{(logical - stored) / 1e6:.1f} MB saved")
+    return {"blobs": blobs, "views": views, "stored_bytes": stored, "logical_bytes": logical}
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate the library and package caches through a shared blob store.")
+    parser.add_argument("--store", default=STORE_DIR, help="store directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS, help="files hashed at once (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="deduplicate files and trees into the store")
+    ingest_parser.add_argument("paths", nargs="+")
+    link_parser = commands.add_parser("link", help="like cp SRC... DIR, but the copies are views of stored blobs")
+    link_parser.add_argument("sources", nargs="+")
+    link_parser.add_argument("dest_dir")
+    commands.add_parser("gc", help="delete blobs no file refers to any more")
+    commands.add_parser("stats", help="report how much space the store saves")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        ingest(args.paths, args.store, args.workers)
+    elif args.command == "link":
+        link_files(args.sources, args.dest_dir, args.store, args.workers)
+    elif args.command == "gc":
+        collect_garbage(args.store)
+    else:
+        store_stats(args.store)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,86 @@
 import os
+import argparse
+import contextlib
+import hashlib
+import json
+import queue
+import re
+import sqlite3
 import subprocess
 import requests
 import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+from requests.adapters import HTTPAdapter
+import blob_store  # Content-addressed store used by --dedupe
 
 # Folder where all resources will be saved
 BASE_DIR = "offline_survival_resources"
 os.makedirs(BASE_DIR, exist_ok=True)
 
+# Download engine settings
+MAX_WORKERS = 8       # Total concurrent downloads
+MAX_PER_HOST = 4      # Concurrent downloads allowed against a single host
+MAX_RETRIES = 3       # Extra attempts after the first failure
+RETRY_BACKOFF = 1.0   # Seconds, doubled after every failed attempt
+MIN_CHUNK_SIZE = 64 * 1024         # Starting read size for a transfer
+MAX_CHUNK_SIZE = 4 * 1024 * 1024   # Largest read size the adaptive sizing will grow to
+CHUNK_TARGET_SECONDS = 0.25        # Aim for reads that take about this long
+
+# Persistent index of every downloaded file, used instead of rescanning the library
+MANIFEST_PATH = os.path.join(BASE_DIR, ".offgrid_manifest.sqlite")
+HASH_WORKERS = os.cpu_count() or 4
+
+# yt-dlp settings
+YTDLP_WORKERS = 3  # Concurrent yt-dlp processes
+YTDLP_ARCHIVE_PATH = os.path.join(BASE_DIR, ".yt-dlp-archive.txt")  # Ledger of fetched video IDs
+_ytdlp_archive_lock = threading.Lock()
+
+# Instrumentation settings
+METRICS_PATH = os.path.join(BASE_DIR, "offgrid_metrics.jsonl")  # Structured events, one JSON object per line
+PROGRESS_INTERVAL = 10  # Seconds between live progress lines
+
+# Scheduling settings
+# Everything in a priority class is fetched before the next class starts, so small
+# critical resources never queue behind bulk video on a shared uplink.
+PRIORITY_CLASSES = ["critical", "high", "normal", "bulk"]
+DEFAULT_PRIORITY = "normal"
+CATEGORY_PRIORITY = {"Medical": "high", "Farming": "normal", "Hunting": "bulk", "Weapons": "bulk"}
+ARCHIVE_PRIORITY = "bulk"
+GITHUB_PRIORITY = "normal"
+RATE_LIMIT = None       # Global bytes/sec cap for all downloads, None for unlimited
+SOURCE_RATE_LIMITS = {}  # Host (or parent domain) -> bytes/sec cap, e.g. {"archive.org": 200_000}
+
+# LAN peer sync settings
+PEER_PORT = 8765                   # Port --serve listens on and --peer assumes
+PEER_PIECE_SIZE = 4 * 1024 * 1024  # Bytes per Range request, every piece is checked against its own hash
+
+# Transcode settings
+# Downloaded videos are re-encoded to this storage profile by --transcode, so they take less
+# disk and play smoothly on low-end devices. Any key can be overridden with --transcode-profile.
+TRANSCODE_PROFILE = {
+    "height": 480,              # Videos taller than this are scaled down
+    "video_codec": "libx264",
+    "video_bitrate": "800k",
+    "preset": "veryfast",
+    "audio_codec": "aac",
+    "audio_bitrate": "96k",
+    "container": "mp4",
+}
+TRANSCODE_WORKERS = os.cpu_count() or 2  # ffmpeg processes, each held to one thread
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".avi", ".mov", ".m4v", ".flv")
+# Names ffprobe reports for the stream each encoder produces
+CODEC_NAMES = {"libx264": "h264", "libx265": "hevc", "libvpx-vp9": "vp9", "libaom-av1": "av1", "libsvtav1": "av1"}
+# ffmpeg muxer of each container extension whose muxer has a different name
+MUXER_NAMES = {"mkv": "matroska", "m4v": "mp4", "ts": "mpegts"}
+
+# Remote sources that are not listed in the catalogs below
+ARCHIVE_URL = "https://archive.org/details/Survival_Lilly_Archive"
+GITHUB_REPO = "https://github.com/PR0M3TH3AN/Survival-Data.git"
+
 # Define categories and their corresponding YouTube video links
 categories = {
     "Medical": [
@@ -31,20 +105,58 @@ categories = {
     ],
 }
 
+# Keywords used to file archive videos into categories, matched against title, tags and description
+CATEGORY_KEYWORDS = {
+    "Medical": ["medical", "medicine", "first aid", "wound", "bleeding", "tourniquet", "suture", "bandage",
+                "herbal", "remedy", "infection", "injury", "fracture", "burn", "health"],
+    "Weapons": ["weapon", "rifle", "gun", "pistol", "shotgun", "firearm", "ammo", "ammunition", "bow",
+                "crossbow", "arrow", "knife", "spear", "slingshot"],
+    "Hunting": ["hunting", "hunt", "trap", "trapping", "snare", "deer", "rabbit", "squirrel", "butcher",
+                "fishing", "fish", "tracking", "foraging"],
+    "Farming": ["farming", "farm", "garden", "gardening", "seed", "crop", "soil", "compost", "livestock",
+                "chicken", "goat", "harvest", "greenhouse", "homestead"],
+}
+# How much a keyword hit counts for in each metadata field
+CLASSIFIER_WEIGHTS = {"title": 3, "tags": 2, "description": 1}
+
 # Survival PDF resources
 resources = [
-    {"url": "https://archive.org/download/ultimate-survival-manual/Ultimate_Survival_Manual.pdf", "filename": "Ultimate_Survival_Manual.pdf"},
-    {"url": "https://archive.org/download/Survival_Manual_20130607/Survival_Manual.pdf", "filename": "Survival_Manual.pdf"},
-    {"url": "https://archive.org/download/HerbalMedicineBook/Herbal_Medicine_for_Beginners.pdf", "filename": "Herbal_Medicine_for_Beginners.pdf"},
-    {"url": "https://archive.org/download/first-aid-manuals/Basic_First_Aid.pdf", "filename": "Basic_First_Aid.pdf"},
-    {"url": "https://archive.org/download/Backyard-Homesteading/Backyard_Homesteading_Guide.pdf", "filename": "Backyard_Homesteading_Guide.pdf"},
-    {"url": "https://archive.org/download/diy-greenhouse/Diy_Greenhouse_Guide.pdf", "filename": "DIY_Greenhouse_Guide.pdf"},
-    {"url": "https://archive.org/download/ham-radio-guide/Ham_Radio_Guide.pdf", "filename": "Ham_Radio_Guide.pdf"},
-    {"url": "https://archive.org/download/MedicalBooks/Emergency_Medical_Guide.pdf", "filename": "Emergency_Medical_Guide.pdf"},
-    {"url": "https://archive.org/download/SurvivalHandbook/Survival_Handbook_Complete.pdf", "filename": "Survival_Handbook_Complete.pdf"},
-    {"url": "https://archive.org/download/SelfSufficiencyGuide/Self_Sufficiency_Guide.pdf", "filename": "Self_Sufficiency_Guide.pdf"}
+    {"url": "https://archive.org/download/ultimate-survival-manual/Ultimate_Survival_Manual.pdf", "filename": "Ultimate_Survival_Manual.pdf", "priority": "high"},
+    {"url": "https://archive.org/download/Survival_Manual_20130607/Survival_Manual.pdf", "filename": "Survival_Manual.pdf", "priority": "high"},
+    {"url": "https://archive.org/download/HerbalMedicineBook/Herbal_Medicine_for_Beginners.pdf", "filename": "Herbal_Medicine_for_Beginners.pdf", "priority": "critical"},
+    {"url": "https://archive.org/download/first-aid-manuals/Basic_First_Aid.pdf", "filename": "Basic_First_Aid.pdf", "priority": "critical"},
+    {"url": "https://archive.org/download/Backyard-Homesteading/Backyard_Homesteading_Guide.pdf", "filename": "Backyard_Homesteading_Guide.pdf", "priority": "normal"},
+    {"url": "https://archive.org/download/diy-greenhouse/Diy_Greenhouse_Guide.pdf", "filename": "DIY_Greenhouse_Guide.pdf", "priority": "normal"},
+    {"url": "https://archive.org/download/ham-radio-guide/Ham_Radio_Guide.pdf", "filename": "Ham_Radio_Guide.pdf", "priority": "high"},
+    {"url": "https://archive.org/download/MedicalBooks/Emergency_Medical_Guide.pdf", "filename": "Emergency_Medical_Guide.pdf", "priority": "critical"},
+    {"url": "https://archive.org/download/SurvivalHandbook/Survival_Handbook_Complete.pdf", "filename": "Survival_Handbook_Complete.pdf", "priority": "high"},
+    {"url": "https://archive.org/download/SelfSufficiencyGuide/Self_Sufficiency_Guide.pdf", "filename": "Self_Sufficiency_Guide.pdf", "priority": "normal"}
 ]
 
+# Function to compile every category's keywords into one pattern with a named group per category
+def build_category_pattern():
+    groups = []
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        words = "|".join(r"\s+".join(map(re.escape, keyword.split())) for keyword in keywords)
+        groups.append(rf"(?P<{category}>\b(?:{words})(?:s|es)?\b)")
+    return re.compile("|".join(groups), re.IGNORECASE)
+
+CATEGORY_PATTERN = build_category_pattern()
+
+# Function to pick the category a video belongs in from its yt-dlp metadata, or None
+def classify_video(info):
+    fields = {
+        "title": info.get("title") or "",
+        "tags": " ".join(info.get("tags") or []),
+        "description": info.get("description") or "",
+    }
+    scores = dict.fromkeys(CATEGORY_KEYWORDS, 0)
+    for field, text in fields.items():
+        for match in CATEGORY_PATTERN.finditer(text):
+            scores[match.lastgroup] += CLASSIFIER_WEIGHTS[field]
+    best = max(scores, key=scores.get)
+    return best if scores[best] else None
+
 # Function to check if a command is available
 def command_exists(command):
     try:
@@ -62,141 +174,1458 @@ def install_package(package, os_type):
     else:
         raise ValueError("Unsupported OS type")
 
-# Function to download a file from the web using requests
-def download_file(url, save_path):
-    if os.path.exists(save_path):
-        print(f"File {save_path} already exists, skipping download.")
+# Shared HTTP session so workers reuse pooled keep-alive connections
+_session = None
+_session_lock = threading.Lock()
+
+# One semaphore per host to cap concurrent connections to it
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def host_slot(url):
+    host = urlparse(url).netloc
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+        return _host_slots[host]
+
+# Manifest connection shared by all download workers
+_manifest = None
+_manifest_lock = threading.Lock()
+
+def get_manifest():
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = sqlite3.connect(MANIFEST_PATH, check_same_thread=False)
+            _manifest.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    source_url TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )""")
+            _manifest.execute("CREATE INDEX IF NOT EXISTS files_source ON files (source_url)")
+            # HTTP cache validators of each downloaded URL, used by --refresh
+            _manifest.execute("""
+                CREATE TABLE IF NOT EXISTS validators (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER
+                )""")
+            # Hashes of each PEER_PIECE_SIZE piece of files served to peers, computed on first request
+            _manifest.execute("""
+                CREATE TABLE IF NOT EXISTS pieces (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    piece_size INTEGER NOT NULL,
+                    hashes TEXT NOT NULL
+                )""")
+            # Job ledger of the transcode stage: the outcome for each video under a given profile
+            _manifest.execute("""
+                CREATE TABLE IF NOT EXISTS transcodes (
+                    path TEXT PRIMARY KEY,
+                    profile TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL
+                )""")
+            # yt-dlp ledger entry of each archive item, so an item whose file is lost is fetched again
+            _manifest.execute("""
+                CREATE TABLE IF NOT EXISTS archive_items (
+                    path TEXT PRIMARY KEY,
+                    entry TEXT NOT NULL
+                )""")
+            # Sources whose last download ran to the end, for sources that can stop partway through
+            _manifest.execute("CREATE TABLE IF NOT EXISTS complete_sources (source_url TEXT PRIMARY KEY)")
+            _manifest.commit()
+        return _manifest
+
+# Function to hash a file without loading it into memory
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to record a file on disk as coming from source_url
+def manifest_record(source_url, path, sha256=None):
+    stat = os.stat(path)
+    if sha256 is None:
+        sha256 = file_sha256(path)
+    db = get_manifest()
+    with _manifest_lock:
+        db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                   (os.path.normpath(path), source_url, stat.st_size, stat.st_mtime_ns, sha256))
+        db.commit()
+
+# Function to drop manifest entries so their resources get fetched again
+def manifest_forget(paths):
+    db = get_manifest()
+    with _manifest_lock:
+        db.executemany("DELETE FROM files WHERE path = ?", [(os.path.normpath(p),) for p in paths])
+        db.commit()
+
+# Function to get the (source_url, size, mtime_ns, sha256) recorded for a path, or None
+def manifest_entry(path):
+    db = get_manifest()
+    with _manifest_lock:
+        return db.execute("SELECT source_url, size, mtime_ns, sha256 FROM files WHERE path = ?",
+                          (os.path.normpath(path),)).fetchone()
+
+# Function to list the manifest entries recorded for a source
+def manifest_lookup(source_url):
+    db = get_manifest()
+    with _manifest_lock:
+        return db.execute("SELECT path, size, mtime_ns, sha256 FROM files WHERE source_url = ?",
+                          (source_url,)).fetchall()
+
+# Function to list every path recorded in the manifest
+def manifest_paths():
+    db = get_manifest()
+    with _manifest_lock:
+        return [path for (path,) in db.execute("SELECT path FROM files")]
+
+# Function to mark whether the last download of a source ran to the end
+def manifest_set_complete(source_url, complete):
+    db = get_manifest()
+    with _manifest_lock:
+        if complete:
+            db.execute("INSERT OR REPLACE INTO complete_sources VALUES (?)", (source_url,))
+        else:
+            db.execute("DELETE FROM complete_sources WHERE source_url = ?", (source_url,))
+        db.commit()
+
+# Function to check whether the last download of a source ran to the end
+def manifest_is_complete(source_url):
+    db = get_manifest()
+    with _manifest_lock:
+        return db.execute("SELECT 1 FROM complete_sources WHERE source_url = ?", (source_url,)).fetchone() is not None
+
+# Function to remember the yt-dlp ledger entry an archive file was fetched under
+def manifest_record_archive_item(path, entry):
+    db = get_manifest()
+    with _manifest_lock:
+        db.execute("INSERT OR REPLACE INTO archive_items VALUES (?, ?)", (os.path.normpath(path), entry))
+        db.commit()
+
+# Function to follow an archive file that was replaced by a file under another name
+def manifest_move_archive_item(path, new_path):
+    db = get_manifest()
+    with _manifest_lock:
+        db.execute("UPDATE archive_items SET path = ? WHERE path = ?", (os.path.normpath(new_path), os.path.normpath(path)))
+        db.commit()
+
+# Function to list the archive items whose file is gone or no longer matches the manifest
+# Returns (path, ledger entry) pairs; verify_manifest drops missing and corrupt files from the manifest.
+def stale_archive_items():
+    db = get_manifest()
+    with _manifest_lock:
+        rows = db.execute("SELECT path, entry FROM archive_items").fetchall()
+    stale = []
+    for path, entry in rows:
+        recorded = manifest_entry(path)
+        if recorded is None or not stat_matches(path, recorded[1], recorded[2]):
+            stale.append((path, entry))
+    return stale
+
+# Function to forget archive items so yt-dlp fetches them again
+def forget_archive_items(items):
+    if not items:
         return
+    forget_ytdlp_archive({entry for _, entry in items})
+    db = get_manifest()
+    with _manifest_lock:
+        db.executemany("DELETE FROM archive_items WHERE path = ?", [(path,) for path, _ in items])
+        db.commit()
+
+# Function to store the ETag, Last-Modified and size a server sent for a URL
+def manifest_store_validators(url, etag, last_modified, size):
+    db = get_manifest()
+    with _manifest_lock:
+        db.execute("INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?)", (url, etag, last_modified, size))
+        db.commit()
+
+# Function to get the stored (etag, last_modified, size) of a URL, or None
+def manifest_validators(url):
+    db = get_manifest()
+    with _manifest_lock:
+        return db.execute("SELECT etag, last_modified, size FROM validators WHERE url = ?", (url,)).fetchone()
+
+# Function to check that a manifest entry still matches the file on disk by size and mtime
+def stat_matches(path, size, mtime_ns):
     try:
-        print(f"Downloading from {url}...")
-        response = requests.get(url, stream=True)
-        with open(save_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        print(f"Downloaded {save_path}")
-    except Exception as e:
-        print(f"Failed to download {url}. Error: {e}")
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+# Function to check that everything recorded for a source is still present and unchanged
+def manifest_is_current(source_url):
+    rows = manifest_lookup(source_url)
+    return bool(rows) and all(stat_matches(path, size, mtime_ns) for path, size, mtime_ns, _ in rows)
+
+# Function to re-verify the manifest against the disk
+# Without full, only files whose size or mtime changed are re-hashed.
+# With full, every file is re-hashed in parallel.
+def verify_manifest(full=False):
+    db = get_manifest()
+    with _manifest_lock:
+        rows = db.execute("SELECT path, source_url, size, mtime_ns, sha256 FROM files").fetchall()
+    missing, to_hash = [], []
+    for path, source_url, size, mtime_ns, sha256 in rows:
+        if not os.path.exists(path):
+            missing.append(path)
+        elif full or not stat_matches(path, size, mtime_ns):
+            to_hash.append((path, source_url, sha256))
+    corrupt = []
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        hashes = pool.map(lambda row: file_sha256(row[0]), to_hash)
+        for (path, source_url, sha256), actual in zip(to_hash, hashes):
+            if actual == sha256:
+                # Content is unchanged, just refresh the stat fields
+                manifest_record(source_url, path, sha256)
+            else:
+                corrupt.append(path)
+    for path in corrupt:
+        # Keep the damaged copy around but out of the way so it is fetched again
+        os.replace(path, path + ".corrupt")
+        print(f"File {path} does not match its recorded hash, moved to {path}.corrupt")
+    for path in missing:
+        print(f"File {path} is missing from the library")
+    manifest_forget(missing + corrupt)
+    print(f"Verified {len(rows)} files: {len(to_hash)} hashed, {len(missing)} missing, {len(corrupt)} corrupt")
+    return missing, corrupt
+
+# Token bucket shared by every thread downloading through it
+# consume() takes tokens on credit and sleeps off any debt, so callers can pass whole chunks.
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+# Buckets built from RATE_LIMIT and SOURCE_RATE_LIMITS by configure_rate_limits()
+_rate_limit = None
+_source_limits = {}
+
+# Function to parse a rate such as 500K, 1.5M or 20000 into bytes/sec
+def parse_rate(text):
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper().removesuffix("B").removesuffix("/S")
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+# Function to (re)build the token buckets from the configured limits
+def configure_rate_limits(rate=None, source_rates=None):
+    global _rate_limit, _source_limits
+    _rate_limit = TokenBucket(rate) if rate else None
+    _source_limits = {source: TokenBucket(limit) for source, limit in (source_rates or {}).items() if limit}
+
+# Function to find the per-source cap that applies to a URL
+def source_key(url):
+    host = urlparse(url).hostname or ""
+    for source in _source_limits:
+        if host == source or host.endswith("." + source):
+            return source
+    return None
+
+# Function to wait until the global and per-source limits allow nbytes more from url
+def throttle(url, nbytes):
+    waited = 0.0
+    if _rate_limit is not None:
+        waited += _rate_limit.consume(nbytes)
+    bucket = _source_limits.get(source_key(url))
+    if bucket is not None:
+        waited += bucket.consume(nbytes)
+    return waited
+
+# Function to build yt-dlp's --limit-rate option, splitting the cap between concurrent processes
+def ytdlp_rate_args(url, processes=1):
+    limits = [bucket.rate for bucket in (_rate_limit, _source_limits.get(source_key(url))) if bucket is not None]
+    if not limits:
+        return []
+    return ['--limit-rate', str(max(int(min(limits) / processes), 1024))]
+
+# Metrics state, guarded by _metrics_lock
+_metrics_lock = threading.Lock()
+_metrics_file = None
+_current_phase = None
+_phase_totals = {}  # phase -> running totals, in the order the phases ran
+_run_started = time.monotonic()
+_first_critical_seconds = None  # Time from the start of the run to the first critical resource
+
+def new_totals():
+    return {"resources": 0, "failed": 0, "bytes": 0, "retries": 0,
+            "network_seconds": 0.0, "disk_seconds": 0.0, "seconds": 0.0, "live_bytes": 0}
+
+# Function to start writing structured events to a JSON lines file
+def open_metrics(path=METRICS_PATH):
+    global _metrics_file
+    with _metrics_lock:
+        _metrics_file = open(path, 'a')
+
+# Function to write one structured event
+def emit(event, **fields):
+    line = json.dumps({"time": time.time(), "event": event, "phase": _current_phase, **fields})
+    with _metrics_lock:
+        if _metrics_file is not None:
+            _metrics_file.write(line + "\n")
+            _metrics_file.flush()
+
+# Function to count bytes as they arrive, for the live progress view
+def add_progress_bytes(nbytes):
+    with _metrics_lock:
+        if _current_phase is not None:
+            _phase_totals[_current_phase]["live_bytes"] += nbytes
+
+# Function to record the outcome of one resource in the current phase
+def record_resource(source, status, seconds, nbytes=0, retries=0, network_seconds=0.0, disk_seconds=0.0):
+    global _first_critical_seconds
+    first_critical = False
+    with _metrics_lock:
+        if _current_phase is not None:
+            if (_first_critical_seconds is None and status != "failed"
+                    and _current_phase.startswith(PRIORITY_CLASSES[0] + ":")):
+                _first_critical_seconds = time.monotonic() - _run_started
+                first_critical = True
+            totals = _phase_totals[_current_phase]
+            totals["resources"] += 1
+            totals["failed"] += status == "failed"
+            totals["bytes"] += nbytes
+            totals["retries"] += retries
+            totals["network_seconds"] += network_seconds
+            totals["disk_seconds"] += disk_seconds
+    emit("resource", source=source, status=status, bytes=nbytes, seconds=seconds, retries=retries,
+         network_seconds=network_seconds, disk_seconds=disk_seconds,
+         bytes_per_sec=nbytes / seconds if seconds > 0 else None)
+    if first_critical:
+        emit("first_critical_resource", source=source, seconds=_first_critical_seconds)
+
+# Context manager that times a provisioning phase and emits its totals
+@contextlib.contextmanager
+def phase(name):
+    global _current_phase
+    with _metrics_lock:
+        _current_phase = name
+        _phase_totals[name] = new_totals()
+    emit("phase_start")
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        with _metrics_lock:
+            totals = _phase_totals[name]
+            totals["seconds"] = time.monotonic() - start
+        emit("phase_end", **phase_report(totals))
+        with _metrics_lock:
+            _current_phase = None
+
+# Function to turn running totals into the fields reported for a phase
+def phase_report(totals):
+    report = {key: value for key, value in totals.items() if key != "live_bytes"}
+    report["bytes_per_sec"] = totals["bytes"] / totals["seconds"] if totals["seconds"] > 0 else None
+    return report
+
+# Background thread that prints an aggregated progress line every interval
+def progress_reporter(stop, interval):
+    last_bytes = 0
+    while not stop.wait(interval):
+        with _metrics_lock:
+            if _current_phase is None:
+                continue
+            name, totals = _current_phase, dict(_phase_totals[_current_phase])
+        live = totals["live_bytes"]
+        rate = max(live - last_bytes, 0) / interval
+        last_bytes = live
+        print(f"[progress] {name}: {totals['resources']} done, {totals['failed']} failed, "
+              f"{live / 1e6:.1f} MB received, {rate / 1e6:.2f} MB/s")
+
+# Function to print and emit the final per-phase report
+def print_summary():
+    with _metrics_lock:
+        phases = {name: phase_report(totals) for name, totals in _phase_totals.items()}
+    emit("summary", phases=phases, first_critical_seconds=_first_critical_seconds)
+    print("Provisioning summary:")
+    print(f"  {'phase':<16} {'seconds':>9} {'items':>6} {'failed':>6} {'retries':>7} {'MB':>9} {'MB/s':>7} {'net s':>8} {'disk s':>8}")
+    for name, report in phases.items():
+        rate = (report["bytes_per_sec"] or 0) / 1e6
+        print(f"  {name:<16} {report['seconds']:>9.1f} {report['resources']:>6} {report['failed']:>6} "
+              f"{report['retries']:>7} {report['bytes'] / 1e6:>9.1f} {rate:>7.2f} "
+              f"{report['network_seconds']:>8.1f} {report['disk_seconds']:>8.1f}")
+    if _first_critical_seconds is not None:
+        print(f"  Time to first critical resource: {_first_critical_seconds:.1f}s")
+
+# Function to grow or shrink the read size so each read takes about CHUNK_TARGET_SECONDS
+def next_chunk_size(chunk_size, nbytes, elapsed):
+    if elapsed <= 0:
+        return min(chunk_size * 2, MAX_CHUNK_SIZE)
+    target = int(nbytes / elapsed * CHUNK_TARGET_SECONDS)
+    return max(MIN_CHUNK_SIZE, min(target, chunk_size * 2, MAX_CHUNK_SIZE))
+
+# Function to stream a URL into a .part file, resuming from whatever is already there
+# Bytes received and the time spent reading the network and writing the disk are added to stats.
+def fetch_to_part(url, part_path, stats):
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with get_session().get(url, stream=True, timeout=30, headers=headers) as response:
+        if response.status_code == 416 and offset:
+            # Nothing left to send; the .part file is complete if it matches the full size
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                return
+            os.remove(part_path)
+            raise IOError(f"Server rejected resume of {part_path}, restarting")
+        response.raise_for_status()
+        stats["etag"] = response.headers.get("ETag")
+        stats["last_modified"] = response.headers.get("Last-Modified")
+        if response.status_code == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            expected = int(total) if total.isdigit() else None
+            mode = 'ab'
+        else:
+            # Server ignored the Range header, start over
+            length = response.headers.get("Content-Length", "")
+            # Content-Length counts encoded bytes, so it can only be checked for identity bodies
+            encoded = "Content-Encoding" in response.headers
+            expected = int(length) if length.isdigit() and not encoded else None
+            offset = 0
+            mode = 'wb'
+        stats["size"] = expected
+        written = offset
+        chunk_size = MIN_CHUNK_SIZE
+        network_seconds = disk_seconds = 0.0
+        try:
+            with open(part_path, mode) as file:
+                while True:
+                    started = time.perf_counter()
+                    chunk = response.raw.read(chunk_size, decode_content=True)
+                    received = time.perf_counter()
+                    if not chunk:
+                        break
+                    file.write(chunk)
+                    written += len(chunk)
+                    network_seconds += received - started
+                    disk_seconds += time.perf_counter() - received
+                    add_progress_bytes(len(chunk))
+                    # Time spent held back by the rate limits counts too, so reads shrink to match the cap
+                    waited = throttle(url, len(chunk))
+                    chunk_size = next_chunk_size(chunk_size, len(chunk), received - started + waited)
+        finally:
+            stats["bytes"] += written - offset
+            stats["network_seconds"] += network_seconds
+            stats["disk_seconds"] += disk_seconds
+    if expected is not None and written != expected:
+        raise IOError(f"Incomplete download of {url}: got {written} of {expected} bytes")
+
+# Function to download a file from the web using requests
+# With force, an existing file is fetched again and only replaced once the new copy is complete.
+def download_file(url, save_path, force=False):
+    part_path = save_path + ".part"
+    if force and os.path.exists(part_path):
+        # A leftover partial may belong to the old version, never resume into it
+        os.remove(part_path)
+    if os.path.exists(save_path) and not force:
+        if not manifest_lookup(url):
+            # File predates the manifest, adopt it as it is
+            manifest_record(url, save_path)
+        print(f"File {save_path} already exists, skipping download.")
+        record_resource(url, "skipped", 0.0)
+        return "skipped"
+    stats = {"bytes": 0, "network_seconds": 0.0, "disk_seconds": 0.0}
+    start = time.monotonic()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            print(f"Downloading from {url}...")
+            with host_slot(url):
+                fetch_to_part(url, part_path, stats)
+            os.replace(part_path, save_path)
+            manifest_record(url, save_path)
+            if "etag" in stats:
+                manifest_store_validators(url, stats["etag"], stats["last_modified"], stats["size"])
+            print(f"Downloaded {save_path}")
+            record_resource(url, "downloaded", time.monotonic() - start, stats["bytes"], attempt,
+                            stats["network_seconds"], stats["disk_seconds"])
+            return "downloaded"
+        except Exception as e:
+            # Client errors (other than rate limiting) will not fix themselves on retry
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            retryable = status is None or status >= 500 or status == 429
+            if retryable and attempt < MAX_RETRIES:
+                delay = RETRY_BACKOFF * (2 ** attempt)
+                print(f"Failed to download {url} (attempt {attempt + 1}). Retrying in {delay:.0f}s. Error: {e}")
+                time.sleep(delay)
+            else:
+                print(f"Failed to download {url}. Error: {e}")
+                record_resource(url, "failed", time.monotonic() - start, stats["bytes"], attempt,
+                                stats["network_seconds"], stats["disk_seconds"])
+                return "failed"
+
+# Function to download many files concurrently and print a single summary
+def download_many(jobs, max_workers=MAX_WORKERS, force=False):
+    results = {"downloaded": [], "skipped": [], "failed": []}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(download_file, url, save_path, force): url for url, save_path in jobs}
+        for future in as_completed(futures):
+            results[future.result()].append(futures[future])
+    elapsed = time.monotonic() - start
+    print(f"Download summary: {len(results['downloaded'])} downloaded, "
+          f"{len(results['skipped'])} skipped, {len(results['failed'])} failed in {elapsed:.1f}s")
+    for url in results["failed"]:
+        print(f"  Failed: {url}")
+    return results
 
 # Download PDF resources
 def download_pdfs():
-    for resource in resources:
-        save_path = os.path.join(BASE_DIR, resource['filename'])
-        download_file(resource['url'], save_path)
+    jobs = [(resource['url'], os.path.join(BASE_DIR, resource['filename'])) for resource in resources]
+    return download_many(jobs)
+
+# Function to ask a server whether a downloaded URL changed, without fetching the body
+# Sends a conditional HEAD (or a GET that is closed before the body when HEAD is refused)
+# and returns "unchanged", "changed" or "failed".
+def check_for_update(url, save_path):
+    if not os.path.exists(save_path):
+        return "changed"
+    stored = manifest_validators(url)
+    headers = {}
+    if stored is not None:
+        if stored[0]:
+            headers["If-None-Match"] = stored[0]
+        if stored[1]:
+            headers["If-Modified-Since"] = stored[1]
+    try:
+        with host_slot(url):
+            response = get_session().head(url, headers=headers, allow_redirects=True, timeout=30)
+            if response.status_code in (405, 501):
+                response = get_session().get(url, headers=headers, stream=True, timeout=30)
+                response.close()
+    except Exception as e:
+        print(f"Failed to check {url} for updates. Error: {e}")
+        return "failed"
+    if response.status_code == 304:
+        return "unchanged"
+    if not response.ok:
+        print(f"Failed to check {url} for updates. Status: {response.status_code}")
+        return "failed"
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    length = response.headers.get("Content-Length", "")
+    size = int(length) if length.isdigit() else None
+    if stored is not None:
+        # Server ignored the conditional headers, compare the validators ourselves
+        changed = ((etag and stored[0] and etag != stored[0])
+                   or (last_modified and stored[1] and last_modified != stored[1])
+                   or (size is not None and stored[2] is not None and size != stored[2]))
+    else:
+        # Nothing stored yet (file predates validators), the size is all there is to compare
+        changed = size is not None and size != os.path.getsize(save_path)
+    if changed:
+        return "changed"
+    manifest_store_validators(url, etag, last_modified, size)
+    return "unchanged"
+
+# Function to re-check every PDF resource and download only the ones that changed
+def refresh_resources(max_workers=MAX_WORKERS):
+    jobs = [(resource['url'], os.path.join(BASE_DIR, resource['filename'])) for resource in resources]
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        statuses = list(pool.map(lambda job: check_for_update(*job), jobs))
+    changed = [job for job, status in zip(jobs, statuses) if status == "changed"]
+    print(f"Refresh check: {statuses.count('unchanged')} unchanged, {len(changed)} changed, "
+          f"{statuses.count('failed')} failed in {time.monotonic() - start:.1f}s")
+    if changed:
+        download_many(changed, max_workers, force=True)
+    return dict(zip((url for url, _ in jobs), statuses))
+
+# Function to get the video ID yt-dlp uses in its download archive
+def youtube_video_id(url):
+    parsed = urlparse(url)
+    if parsed.path == "/watch":
+        return parse_qs(parsed.query).get("v", [None])[0]
+    # youtu.be/<id> and youtube.com/shorts/<id>
+    return parsed.path.rstrip("/").rsplit("/", 1)[-1] or None
+
+# Function to read the download archive ledger into a set of "youtube <id>" entries
+def read_ytdlp_archive():
+    with _ytdlp_archive_lock:
+        if not os.path.exists(YTDLP_ARCHIVE_PATH):
+            return set()
+        with open(YTDLP_ARCHIVE_PATH) as file:
+            return {line.strip() for line in file if line.strip()}
+
+# Function to drop entries from the ledger so yt-dlp fetches those videos again
+def forget_ytdlp_archive(entries):
+    with _ytdlp_archive_lock:
+        if not os.path.exists(YTDLP_ARCHIVE_PATH):
+            return
+        with open(YTDLP_ARCHIVE_PATH) as file:
+            kept = [line for line in file if line.strip() not in entries]
+        with open(YTDLP_ARCHIVE_PATH + ".tmp", 'w') as file:
+            file.writelines(kept)
+        os.replace(YTDLP_ARCHIVE_PATH + ".tmp", YTDLP_ARCHIVE_PATH)
+
+# Function to add entries to the ledger so yt-dlp skips those videos
+def add_ytdlp_archive(entries):
+    with _ytdlp_archive_lock:
+        known = set()
+        if os.path.exists(YTDLP_ARCHIVE_PATH):
+            with open(YTDLP_ARCHIVE_PATH) as file:
+                known = {line.strip() for line in file}
+        with open(YTDLP_ARCHIVE_PATH, 'a') as file:
+            file.writelines(f"{entry}\n" for entry in sorted(set(entries) - known))
+
+# Function to download a single YouTube video into its category directory
+def download_youtube_video(video, category_dir, processes=1):
+    output_path = os.path.join(category_dir, '%(title)s.%(ext)s')
+    start = time.monotonic()
+    try:
+        # yt-dlp names files by title, so ask it for the final path to record
+        result = subprocess.run(['yt-dlp', '--no-simulate', '--print', 'after_move:filepath',
+                                 '--download-archive', YTDLP_ARCHIVE_PATH, *ytdlp_rate_args(video, processes),
+                                 '-o', output_path, video],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except Exception as e:
+        record_resource(video, "failed", time.monotonic() - start)
+        return "failed", str(e)
+    if result.returncode != 0:
+        record_resource(video, "failed", time.monotonic() - start)
+        errors = [line for line in result.stderr.splitlines() if line.strip()]
+        return "failed", errors[-1] if errors else f"yt-dlp exited with status {result.returncode}"
+    paths = [path for path in result.stdout.splitlines() if path and os.path.isfile(path)]
+    for path in paths:
+        manifest_record(video, path)
+    record_resource(video, "downloaded", time.monotonic() - start, sum(os.path.getsize(path) for path in paths))
+    return "downloaded", paths[0] if paths else category_dir
 
 # Function to download YouTube videos into categories
-def download_youtube_videos():
-    for category, links in categories.items():
+# Videos already in the download archive ledger are skipped without starting yt-dlp,
+# the rest are fetched by a pool of YTDLP_WORKERS concurrent yt-dlp processes.
+def download_youtube_videos(max_workers=None, links_by_category=None):
+    max_workers = max_workers or YTDLP_WORKERS
+    fetched = read_ytdlp_archive()
+    results = {}
+    jobs = []
+    stale = set()
+    for category, links in (links_by_category or categories).items():
         category_dir = os.path.join(BASE_DIR, category)
         os.makedirs(category_dir, exist_ok=True)
-
         for video in links:
-            video_path = os.path.join(category_dir, f"{video.split('watch?v=')[-1]}.mp4")
-            if os.path.exists(video_path):
-                print(f"Video {video_path} already exists, skipping download.")
-                continue
-            print(f"Downloading video {video} to {category} category...")
-            try:
-                output_path = os.path.join(category_dir, '%(title)s.%(ext)s')
-                subprocess.run(['yt-dlp', '-o', output_path, video], check=True)
-                print(f"Downloaded video to {category_dir}")
-            except subprocess.CalledProcessError as e:
-                print(f"Failed to download video {video}. Error: {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred while downloading video {video}. Error: {e}")
+            entry = f"youtube {youtube_video_id(video)}"
+            if entry in fetched:
+                if manifest_is_current(video):
+                    results[video] = ("skipped", category)
+                    record_resource(video, "skipped", 0.0)
+                    continue
+                # Ledger says fetched but the file is gone or changed
+                stale.add(entry)
+            jobs.append((video, category, category_dir))
+    if stale:
+        forget_ytdlp_archive(stale)
+
+    print(f"Downloading {len(jobs)} videos with {max_workers} workers, {len(results)} already downloaded...")
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        processes = min(max_workers, len(jobs)) or 1
+        futures = {pool.submit(download_youtube_video, video, category_dir, processes): (video, category)
+                   for video, category, category_dir in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            video, category = futures[future]
+            status, detail = future.result()
+            results[video] = (status, detail)
+            if status == "failed":
+                print(f"[{done}/{len(jobs)}] Failed to download video {video}. Error: {detail}")
+            else:
+                print(f"[{done}/{len(jobs)}] Downloaded video {video} to {category} category")
+
+    counts = {"downloaded": 0, "skipped": 0, "failed": 0}
+    for status, _ in results.values():
+        counts[status] += 1
+    print(f"Video summary: {counts['downloaded']} downloaded, {counts['skipped']} skipped, "
+          f"{counts['failed']} failed in {time.monotonic() - start:.1f}s")
+    return results
+
+# Function to move one finished archive video into its category and record it
+def file_archive_video(info, archive_url):
+    path = info.get("filepath")
+    if not path or not os.path.isfile(path):
+        return None
+    category = classify_video(info)
+    if category:
+        category_dir = os.path.join(BASE_DIR, category)
+        os.makedirs(category_dir, exist_ok=True)
+        dst = os.path.join(category_dir, os.path.basename(path))
+        os.replace(path, dst)
+        path = dst
+        print(f"Moved {os.path.basename(path)} to {category_dir}")
+    manifest_record(archive_url, path)
+    if info.get("id"):
+        # The entry yt-dlp wrote to its download archive for this item
+        manifest_record_archive_item(path, f"{(info.get('extractor_key') or 'ArchiveOrg').lower()} {info['id']}")
+    record_resource(path, "downloaded", info.get("seconds", 0.0), os.path.getsize(path))
+    return category
 
 # Function to download all videos from Archive.org URL and categorize them
+# yt-dlp prints each item's metadata as soon as it is downloaded, and a filing thread
+# categorizes it while the next one downloads. Items already in the download archive
+# ledger are skipped by yt-dlp, so an interrupted run picks up where it stopped.
+# The archive only counts as complete once yt-dlp has gone through it to the end.
 def download_archive_videos(archive_url):
     archive_dir = os.path.join(BASE_DIR, "Archive_Videos")
     os.makedirs(archive_dir, exist_ok=True)
-    if any(os.path.isfile(os.path.join(archive_dir, f)) for f in os.listdir(archive_dir)):
-        print(f"Videos in {archive_dir} already exist, skipping download.")
-        return
+    finished = queue.Queue()
+    counts = {"filed": 0, "unfiled": 0, "failed": 0}
+    completed = False
+
+    # Items whose file went missing or was moved aside as corrupt are dropped from the ledger
+    stale = stale_archive_items()
+    if stale:
+        print(f"Fetching {len(stale)} archive videos again, their files are missing or changed")
+        forget_archive_items(stale)
+    manifest_set_complete(archive_url, False)
+
+    def filer():
+        while (info := finished.get()) is not None:
+            try:
+                category = file_archive_video(info, archive_url)
+                counts["filed" if category else "unfiled"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"Failed to file {info.get('filepath')}. Error: {e}")
+
+    filing_thread = threading.Thread(target=filer, daemon=True)
+    filing_thread.start()
     try:
-        subprocess.run(['yt-dlp', '--output', os.path.join(archive_dir, '%(title)s.%(ext)s'), archive_url], check=True)
+        process = subprocess.Popen(['yt-dlp', '--download-archive', YTDLP_ARCHIVE_PATH, '--no-simulate',
+                                    *ytdlp_rate_args(archive_url),
+                                    '--print', 'after_move:%(.{filepath,id,extractor_key,title,tags,description})j',
+                                    '--output', os.path.join(archive_dir, '%(title)s.%(ext)s'), archive_url],
+                                   stdout=subprocess.PIPE, text=True)
+        last = time.monotonic()
+        for line in process.stdout:
+            try:
+                info = json.loads(line)
+            except ValueError:
+                continue
+            # yt-dlp fetches items one after another, so an item took the time since the previous one
+            now = time.monotonic()
+            info["seconds"], last = now - last, now
+            finished.put(info)
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+        completed = True
         print(f"Downloaded all videos from {archive_url} to {archive_dir}")
-
-        # Categorize downloaded archive videos
-        for file in os.listdir(archive_dir):
-            for category in categories.keys():
-                if category.lower() in file.lower():
-                    category_dir = os.path.join(BASE_DIR, category)
-                    os.makedirs(category_dir, exist_ok=True)
-                    os.rename(os.path.join(archive_dir, file), os.path.join(category_dir, file))
-                    print(f"Moved {file} to {category_dir}")
     except subprocess.CalledProcessError as e:
         print(f"Failed to download videos from {archive_url}. Error: {e}")
     except Exception as e:
         print(f"An unexpected error occurred while downloading from {archive_url}. Error: {e}")
+    finally:
+        finished.put(None)
+        filing_thread.join()
+        manifest_set_complete(archive_url, completed and not counts["failed"])
+        print(f"Filed {counts['filed']} archive videos into categories, {counts['unfiled']} left in {archive_dir}")
+
+# Function to run git inside a repository and return its output
+def git(repo_dir, *args):
+    return subprocess.run(["git", "-C", repo_dir, *args], check=True, stdout=subprocess.PIPE, text=True).stdout
+
+# Function to reduce a git remote URL to a form that compares equal however it was written
+def repo_name(url):
+    url = url.strip().rstrip("/")
+    return (url[:-len(".git")] if url.endswith(".git") else url).lower()
+
+# Function to place a file from the clone into BASE_DIR, as a hardlink where the filesystem allows
+def materialize(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = dst + ".offgrid-tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
 
-# Function to clone and extract all files from GitHub repository
+# Function to clone and incrementally sync all files from GitHub repository
+# The first run makes a shallow clone, later runs fast-forward it. Only files that
+# changed since the commit recorded in refs/offgrid/synced are re-linked into BASE_DIR.
 def download_github_pdfs():
-    github_repo = "https://github.com/PR0M3TH3AN/Survival-Data.git"
     github_dir = os.path.join(BASE_DIR, "HOME")
-    os.makedirs(github_dir, exist_ok=True)
-    
-    # Check if all expected files exist
-    expected_files = set()
-    for root, dirs, files in os.walk(github_dir):
-        for name in files:
-            expected_files.add(os.path.join(root, name))
-    
-    if expected_files:
-        print(f"All files in {github_dir} already exist, skipping download.")
-        return
-    
+
     try:
-        subprocess.run(["git", "clone", github_repo, github_dir], check=True)
-        print("GitHub repository cloned successfully.")
-
-        # Copy all files and directories from the HOME directory to BASE_DIR
-        for root, dirs, files in os.walk(github_dir):
-            for name in files:
-                src = os.path.join(root, name)
-                dst = os.path.join(BASE_DIR, os.path.relpath(src, github_dir))
-                os.makedirs(os.path.dirname(dst), exist_ok=True)
-                shutil.copy2(src, dst)
-                print(f"Extracted {name} to {BASE_DIR}")
+        if os.path.isdir(os.path.join(github_dir, ".git")):
+            origin = subprocess.run(["git", "-C", github_dir, "remote", "get-url", "origin"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+            if repo_name(origin) != repo_name(GITHUB_REPO):
+                # The package scripts clone another repository to this same place
+                print(f"{github_dir} is a clone of {origin or 'an unknown repository'}, not {GITHUB_REPO}, "
+                      f"move it aside to sync the GitHub repository.")
+                return
+            git(github_dir, "pull", "--ff-only", "--quiet")
+        elif os.path.isdir(github_dir) and os.listdir(github_dir):
+            print(f"{github_dir} is not a git clone, remove it to sync the GitHub repository.")
+            return
+        else:
+            subprocess.run(["git", "clone", "--depth=1", GITHUB_REPO, github_dir], check=True)
+            print("GitHub repository cloned successfully.")
+
+        head = git(github_dir, "rev-parse", "HEAD").strip()
+        synced = subprocess.run(["git", "-C", github_dir, "rev-parse", "--verify", "--quiet", "refs/offgrid/synced"],
+                                stdout=subprocess.PIPE, text=True).stdout.strip()
+        if synced == head:
+            print(f"All files in {github_dir} are up to date.")
+            return
+
+        if synced:
+            fields = git(github_dir, "diff", "--name-status", "--no-renames", "-z", synced, head).split("\0")
+            changes = list(zip(fields[0::2], fields[1::2]))
+        else:
+            changes = [("A", path) for path in git(github_dir, "ls-files", "-z").split("\0") if path]
+
+        removed = []
+        for status, path in changes:
+            src = os.path.join(github_dir, path)
+            dst = os.path.join(BASE_DIR, path)
+            if status == "D":
+                if os.path.lexists(dst):
+                    os.remove(dst)
+                removed.append(dst)
+                print(f"Removed {path} from {BASE_DIR}")
+            elif os.path.isfile(src):
+                start = time.monotonic()
+                materialize(src, dst)
+                manifest_record(GITHUB_REPO, dst)
+                record_resource(path, "downloaded", time.monotonic() - start, os.path.getsize(dst))
+                print(f"Extracted {path} to {BASE_DIR}")
+        manifest_forget(removed)
+        git(github_dir, "update-ref", "refs/offgrid/synced", head)
+        print(f"Synced {len(changes)} changed files from {GITHUB_REPO}")
     except Exception as e:
-        print(f"Failed to clone GitHub repository. Error: {e}")
+        print(f"Failed to sync GitHub repository. Error: {e}")
 
-# Function to check for the existence of all files before downloading
-def check_files_exist():
-    # Check PDFs
-    for resource in resources:
-        save_path = os.path.join(BASE_DIR, resource['filename'])
-        if not os.path.exists(save_path):
+# Function to hash a file in fixed size pieces
+def piece_hashes(path, piece_size=PEER_PIECE_SIZE):
+    hashes = []
+    with open(path, 'rb') as file:
+        for piece in iter(lambda: file.read(piece_size), b""):
+            hashes.append(hashlib.sha256(piece).hexdigest())
+    return hashes
+
+# Function to get the piece hashes of a library file, cached in the manifest until the file changes
+def manifest_piece_hashes(path):
+    stat = os.stat(path)
+    db = get_manifest()
+    with _manifest_lock:
+        row = db.execute("SELECT size, mtime_ns, piece_size, hashes FROM pieces WHERE path = ?", (path,)).fetchone()
+    if row is not None and row[:3] == (stat.st_size, stat.st_mtime_ns, PEER_PIECE_SIZE):
+        return row[3].split(",") if row[3] else []
+    hashes = piece_hashes(path)
+    with _manifest_lock:
+        db.execute("INSERT OR REPLACE INTO pieces VALUES (?, ?, ?, ?, ?)",
+                   (path, stat.st_size, stat.st_mtime_ns, PEER_PIECE_SIZE, ",".join(hashes)))
+        db.commit()
+    return hashes
+
+# Function to list the files this node offers to peers, keyed by their path relative to BASE_DIR
+# Only files that still match the manifest are offered, so their recorded hashes can be trusted.
+def peer_library():
+    db = get_manifest()
+    with _manifest_lock:
+        rows = db.execute("SELECT path, source_url, size, mtime_ns, sha256 FROM files").fetchall()
+    library = {}
+    for path, source_url, size, mtime_ns, sha256 in rows:
+        relative = os.path.relpath(path, BASE_DIR)
+        if relative.startswith(os.pardir) or not stat_matches(path, size, mtime_ns):
+            continue
+        library[relative.replace(os.sep, "/")] = {"source_url": source_url, "size": size, "sha256": sha256}
+    return library
+
+# Function to map a path a peer asked for to a current library file, returning (path, size) or None
+def peer_file(relative):
+    path = os.path.normpath(os.path.join(BASE_DIR, *relative.split("/")))
+    entry = manifest_entry(path)
+    if entry is None or not stat_matches(path, entry[1], entry[2]):
+        return None
+    return path, entry[1]
+
+# Serves the library to other nodes on the LAN
+#   GET /manifest        every offered file with its size, sha256 and source, plus the yt-dlp ledger
+#   GET /pieces/<path>   the sha256 of each PEER_PIECE_SIZE piece of a file
+#   GET /files/<path>    the file itself, with Range support
+# Only files recorded in the manifest are ever served.
+class PeerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        route, _, relative = urlparse(self.path).path.lstrip("/").partition("/")
+        try:
+            if route == "manifest":
+                self.send_json({"files": peer_library(), "ytdlp_archive": sorted(read_ytdlp_archive())})
+            elif route == "pieces" and (found := peer_file(unquote(relative))):
+                self.send_json({"piece_size": PEER_PIECE_SIZE, "hashes": manifest_piece_hashes(found[0])})
+            elif route == "files" and (found := peer_file(unquote(relative))):
+                self.send_library_file(*found)
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_json(self, data):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_library_file(self, path, size):
+        start, end = 0, size - 1
+        byte_range = self.headers.get("Range", "")
+        if byte_range.startswith("bytes="):
+            first, _, last = byte_range[len("bytes="):].partition("-")
+            try:
+                start = int(first or 0)
+                end = min(int(last), end) if last else end
+            except ValueError:
+                self.send_error(400)
+                return
+            if start > end:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if end >= start:
+            with open(path, 'rb') as file:
+                self.connection.sendfile(file, start, end - start + 1)
+
+    def log_message(self, format, *args):
+        pass
+
+# Function to serve the library to other nodes until interrupted
+def serve_library(port=PEER_PORT):
+    server = ThreadingHTTPServer(("", port), PeerHandler)
+    server.daemon_threads = True
+    print(f"Serving {len(peer_library())} library files to peers on port {server.server_port}, press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+# Function to turn a peer given as host, host:port or a URL into its base URL
+def peer_url(peer):
+    parsed = urlparse(peer if "://" in peer else "http://" + peer)
+    netloc = parsed.netloc if parsed.port else f"{parsed.netloc}:{PEER_PORT}"
+    return f"{parsed.scheme}://{netloc}"
+
+# Function to fetch a peer's file list, timing the request to rank the peers by distance
+def fetch_peer_manifest(base_url):
+    start = time.monotonic()
+    response = get_session().get(base_url + "/manifest", timeout=30)
+    response.raise_for_status()
+    return time.monotonic() - start, response.json()
+
+# Requests in flight to each peer during a sync, so pieces go to whichever peer is least busy
+_peer_load = {}
+_peer_load_lock = threading.Lock()
+
+# Function to pick the least busy peer holding a file, the nearest one on a tie
+def pick_peer(holders, excluded):
+    with _peer_load_lock:
+        candidates = [peer for peer in holders if peer not in excluded]
+        if not candidates:
+            return None
+        peer = min(candidates, key=lambda candidate: _peer_load[candidate])
+        _peer_load[peer] += 1
+        return peer
+
+# Function to get a file's piece hashes and create the .part file its pieces are written into
+# A .part of the right size left by an interrupted sync is kept, and its good pieces are not fetched again.
+def prepare_peer_job(job):
+    if job["size"] <= PEER_PIECE_SIZE:
+        # A single piece is the whole file, so its hash is already known
+        job["piece_size"], job["hashes"] = PEER_PIECE_SIZE, [job["sha256"]] if job["size"] else []
+    else:
+        for peer in job["holders"]:
+            try:
+                response = get_session().get(f"{peer}/pieces/{quote(job['relative'])}", timeout=300)
+                response.raise_for_status()
+                pieces = response.json()
+                if len(pieces["hashes"]) != -(-job["size"] // pieces["piece_size"]):
+                    raise IOError("piece list does not match the file size")
+                job["piece_size"], job["hashes"] = pieces["piece_size"], pieces["hashes"]
+                break
+            except Exception as e:
+                print(f"Failed to get the pieces of {job['relative']} from {peer}. Error: {e}")
+        else:
+            raise IOError(f"no peer could list the pieces of {job['relative']}")
+    os.makedirs(os.path.dirname(job["path"]), exist_ok=True)
+    job["resume"] = os.path.exists(job["part"]) and os.path.getsize(job["part"]) == job["size"]
+    if not job["resume"]:
+        with open(job["part"], 'wb') as file:
+            file.truncate(job["size"])
+    return job
+
+# Function to fetch one piece of a file from the peers into its .part file, returning the bytes fetched
+# Each piece is checked against its hash, and a failed or bad piece is asked for from the next peer.
+def fetch_piece(job, index):
+    offset = index * job["piece_size"]
+    length = min(job["piece_size"], job["size"] - offset)
+    if job["resume"]:
+        with open(job["part"], 'rb') as file:
+            file.seek(offset)
+            if hashlib.sha256(file.read(length)).hexdigest() == job["hashes"][index]:
+                return 0
+    for attempt in range(MAX_RETRIES + 1):
+        if job["failed"]:
+            return 0
+        tried = set()
+        while (peer := pick_peer(job["holders"], tried)) is not None:
+            tried.add(peer)
+            url = f"{peer}/files/{quote(job['relative'])}"
+            try:
+                with host_slot(url):
+                    response = get_session().get(url, headers={"Range": f"bytes={offset}-{offset + length - 1}"},
+                                                 timeout=30)
+                response.raise_for_status()
+                piece = response.content
+                if hashlib.sha256(piece).hexdigest() != job["hashes"][index]:
+                    raise IOError("piece does not match its hash")
+            except Exception as e:
+                print(f"Failed to fetch piece {index + 1} of {job['relative']} from {peer}. Error: {e}")
+                continue
+            finally:
+                with _peer_load_lock:
+                    _peer_load[peer] -= 1
+            with open(job["part"], 'r+b') as file:
+                file.seek(offset)
+                file.write(piece)
+            add_progress_bytes(len(piece))
+            throttle(url, len(piece))
+            return len(piece)
+        if attempt < MAX_RETRIES:
+            time.sleep(RETRY_BACKOFF * (2 ** attempt))
+    raise IOError(f"no peer could supply piece {index + 1} of {job['relative']}")
+
+# Function to check an assembled file against its hash and move it into the library
+def finish_peer_file(job):
+    sha256 = file_sha256(job["part"])
+    if sha256 != job["sha256"]:
+        os.remove(job["part"])
+        raise IOError(f"{job['relative']} does not match its hash after assembly")
+    os.replace(job["part"], job["path"])
+    manifest_record(job["source_url"], job["path"], sha256)
+
+# Function to pull missing or changed library files from other nodes on the LAN
+# The peers' manifests are compared with this one, so only files this node lacks (or holds a
+# different version of) are transferred. Their pieces are fetched in parallel from every peer
+# that has them, each going to the least busy peer, and verified by hash. Files fetched here
+# count as fetched from their original source, so the internet downloads that follow skip them.
+def sync_from_peers(peers, max_workers=MAX_WORKERS):
+    start = time.monotonic()
+    results = {"downloaded": [], "present": [], "failed": []}
+    manifests = {}
+    for peer in map(peer_url, peers):
+        try:
+            manifests[peer] = fetch_peer_manifest(peer)
+        except Exception as e:
+            print(f"Failed to reach peer {peer}. Error: {e}")
+    if not manifests:
+        print("No peers could be reached.")
+        return results
+    ranked = sorted(manifests, key=lambda peer: manifests[peer][0])
+
+    # The version of a file most peers hold wins, the nearest peer breaks a tie
+    offers = {}
+    for peer in ranked:
+        for relative, entry in manifests[peer][1]["files"].items():
+            offers.setdefault(relative, {}).setdefault(entry["sha256"], (entry, []))[1].append(peer)
+
+    base_dir = os.path.normpath(BASE_DIR)
+    jobs, sources = [], {}
+    for relative, versions in offers.items():
+        entry, holders = max(versions.values(), key=lambda version: len(version[1]))
+        path = os.path.normpath(os.path.join(base_dir, *relative.split("/")))
+        if not path.startswith(base_dir + os.sep):
+            print(f"Ignoring {relative}, it is outside the library")
+            continue
+        sources.setdefault(entry["source_url"], []).append(relative)
+        local = manifest_entry(path)
+        if local is not None and local[3] == entry["sha256"] and stat_matches(path, local[1], local[2]):
+            results["present"].append(relative)
+            continue
+        if local is None and os.path.isfile(path) and os.path.getsize(path) == entry["size"]:
+            # File predates the manifest, adopt it if it is the same version
+            if file_sha256(path) == entry["sha256"]:
+                manifest_record(entry["source_url"], path, entry["sha256"])
+                results["present"].append(relative)
+                continue
+        jobs.append({"relative": relative, "path": path, "part": path + ".part", "holders": holders,
+                     "size": entry["size"], "sha256": entry["sha256"], "source_url": entry["source_url"],
+                     "bytes": 0, "failed": False, "started": time.monotonic()})
+
+    print(f"Pulling {len(jobs)} files from {len(ranked)} peers, {len(results['present'])} already present...")
+    with _peer_load_lock:
+        _peer_load.update(dict.fromkeys(ranked, 0))
+    remaining = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(prepare_peer_job, job): ("prepare", job) for job in jobs}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                step, job = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not job["failed"]:
+                        job["failed"] = True
+                        print(f"Failed to pull {job['relative']}. Error: {e}")
+                        results["failed"].append(job["relative"])
+                        record_resource(job["relative"], "failed", time.monotonic() - job["started"], job["bytes"])
+                    continue
+                if step == "prepare":
+                    remaining[job["relative"]] = len(job["hashes"])
+                    for index in range(len(job["hashes"])):
+                        pending[pool.submit(fetch_piece, job, index)] = ("piece", job)
+                elif step == "piece":
+                    job["bytes"] += result
+                    remaining[job["relative"]] -= 1
+                else:
+                    results["downloaded"].append(job["relative"])
+                    record_resource(job["relative"], "downloaded", time.monotonic() - job["started"], job["bytes"])
+                    print(f"Pulled {job['relative']}")
+                    continue
+                if remaining[job["relative"]] == 0 and not job["failed"]:
+                    pending[pool.submit(finish_peer_file, job)] = ("finish", job)
+
+    # Carry over the yt-dlp ledger entries of sources that are now complete, so yt-dlp skips them too
+    failed = set(results["failed"])
+    complete = {source for source, paths in sources.items() if not failed.intersection(paths)}
+    video_entries = {f"youtube {youtube_video_id(source)}" for source in complete}
+    ledger = set().union(*(manifest["ytdlp_archive"] for _, manifest in manifests.values()))
+    add_ytdlp_archive(entry for entry in ledger
+                      if entry in video_entries or (not entry.startswith("youtube ") and ARCHIVE_URL in complete))
+
+    print(f"Peer sync summary: {len(results['downloaded'])} pulled, {len(results['present'])} already present, "
+          f"{len(results['failed'])} failed in {time.monotonic() - start:.1f}s")
+    return results
+
+# Function to turn a bitrate such as 800k or 2M into bits per second
+def parse_bitrate(text):
+    text = str(text).strip().lower()
+    scale = {"k": 1000, "m": 1000 ** 2}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+# Function to describe a profile as one string, stored in the ledger to notice profile changes
+def profile_key(profile):
+    return json.dumps(profile, sort_keys=True)
+
+# Function to read the codec, height, bitrate and duration of a video's first video stream with ffprobe
+def probe_video(path):
+    result = subprocess.run(["ffprobe", "-v", "error", "-select_streams", "v:0",
+                             "-show_entries", "stream=codec_name,height:format=bit_rate,duration", "-of", "json", path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if line.strip()]
+        raise RuntimeError(errors[-1] if errors else f"ffprobe exited with status {result.returncode}")
+    info = json.loads(result.stdout)
+    stream = (info.get("streams") or [{}])[0]
+    bit_rate = info.get("format", {}).get("bit_rate")
+    duration = info.get("format", {}).get("duration")
+    return (stream.get("codec_name"), stream.get("height"), int(bit_rate) if bit_rate else None,
+            float(duration) if duration else None)
+
+# Function to check whether a video already fits a profile, so transcoding it would gain nothing
+def in_profile(path, profile):
+    codec, height, bit_rate, _ = probe_video(path)
+    budget = parse_bitrate(profile["video_bitrate"]) + parse_bitrate(profile["audio_bitrate"])
+    return (path.lower().endswith("." + profile["container"])
+            and codec == CODEC_NAMES.get(profile["video_codec"], profile["video_codec"])
+            and height is not None and height <= profile["height"]
+            # Leave some headroom, encoders never hit the target bitrate exactly
+            and (bit_rate is None or bit_rate <= budget * 1.1))
+
+# Function to build the ffmpeg command that re-encodes a video to a profile
+def transcode_command(src, dst, profile):
+    return ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", src,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", f"scale=-2:'min({profile['height']},ih)'",
+            "-c:v", profile["video_codec"], "-b:v", profile["video_bitrate"], "-preset", profile["preset"],
+            "-c:a", profile["audio_codec"], "-b:a", profile["audio_bitrate"],
+            "-threads", "1", "-movflags", "+faststart",
+            "-f", MUXER_NAMES.get(profile["container"], profile["container"]), dst]
+
+# Function to write a video's outcome to the transcode ledger
+def ledger_record(path, profile, status):
+    stat = os.stat(path)
+    db = get_manifest()
+    with _manifest_lock:
+        db.execute("INSERT OR REPLACE INTO transcodes VALUES (?, ?, ?, ?, ?)",
+                   (os.path.normpath(path), profile_key(profile), status, stat.st_size, stat.st_mtime_ns))
+        db.commit()
+
+# Function to check whether the ledger already has an outcome for a video, as it is now, under a profile
+def ledger_done(path, profile):
+    db = get_manifest()
+    with _manifest_lock:
+        row = db.execute("SELECT profile, size, mtime_ns FROM transcodes WHERE path = ?",
+                         (os.path.normpath(path),)).fetchone()
+    return row is not None and row[0] == profile_key(profile) and stat_matches(path, row[1], row[2])
+
+# Function to check whether a file next to a video is an earlier transcode of it under a profile
+# It must not belong to another source, must fit the profile and must run as long as the original.
+def is_transcode_of(dst, path, source_url, profile):
+    recorded = manifest_entry(dst)
+    if recorded is not None and recorded[0] != source_url:
+        return False
+    try:
+        if not in_profile(dst, profile):
             return False
+        original, transcoded = probe_video(path)[3], probe_video(dst)[3]
+    except (RuntimeError, ValueError):
+        return False
+    return original is not None and transcoded is not None and abs(original - transcoded) < 1.0
+
+# Function to record a transcode in the manifest and ledger, and only then remove the original
+# A run that stops before the original is gone leaves both files recorded, and the next run
+# recognises the new one with is_transcode_of instead of encoding the video a third time.
+def finish_transcode(path, dst, source_url, profile):
+    manifest_record(source_url, dst)
+    ledger_record(dst, profile, "transcoded")
+    if dst != path:
+        manifest_move_archive_item(path, dst)
+        os.remove(path)
+        manifest_forget([path])
 
-    # Check YouTube videos
+# Function to transcode one library video, returning (status, path, bytes before, bytes after)
+# The new encoding is written next to the original and swapped in with os.replace, so an
+# interrupted run never leaves a half-written video in the library.
+def transcode_video(path, source_url, profile):
+    before = os.path.getsize(path)
+    if in_profile(path, profile):
+        ledger_record(path, profile, "in_profile")
+        return "in_profile", path, before, before
+    stem = os.path.splitext(path)[0]
+    dst = f"{stem}.{profile['container']}"
+    if dst != path and os.path.exists(dst):
+        if is_transcode_of(dst, path, source_url, profile):
+            # Swapped in by a run that stopped before it removed the original
+            after = os.path.getsize(dst)
+            finish_transcode(path, dst, source_url, profile)
+            return "transcoded", dst, before, after
+        # Another library file already has that name
+        dst = f"{stem}.{profile['height']}p.{profile['container']}"
+    tmp = f"{stem}.transcode-tmp.{profile['container']}"
+    try:
+        subprocess.run(transcode_command(path, tmp, profile), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        errors = [line for line in e.stderr.splitlines() if line.strip()]
+        raise RuntimeError(errors[-1] if errors else f"ffmpeg exited with status {e.returncode}")
+    after = os.path.getsize(tmp)
+    if after >= before:
+        # Re-encoding would not save anything, keep the original
+        os.remove(tmp)
+        ledger_record(path, profile, "kept")
+        return "kept", path, before, before
+    os.replace(tmp, dst)
+    finish_transcode(path, dst, source_url, profile)
+    return "transcoded", dst, before, after
+
+# Function to transcode every video in the library to a storage profile
+# Videos are taken from the manifest and spread over a pool of ffmpeg processes. Each
+# outcome goes to the ledger, so a rerun (or a resumed, interrupted run) only looks at
+# videos that are new, changed since, or were handled under a different profile.
+def transcode_videos(profile=None, max_workers=TRANSCODE_WORKERS):
+    profile = profile or TRANSCODE_PROFILE
+    db = get_manifest()
+    with _manifest_lock:
+        rows = db.execute("SELECT path, source_url FROM files").fetchall()
+    videos = [(path, source_url) for path, source_url in rows if path.lower().endswith(VIDEO_EXTENSIONS)]
+    for path, _ in videos:
+        # Left behind by an interrupted run
+        tmp = f"{os.path.splitext(path)[0]}.transcode-tmp.{profile['container']}"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    jobs = [(path, source_url) for path, source_url in videos if os.path.exists(path) and not ledger_done(path, profile)]
+
+    print(f"Transcoding {len(jobs)} videos with {max_workers} workers, "
+          f"{len(videos) - len(jobs)} already handled...")
+    counts = {"transcoded": 0, "in_profile": 0, "kept": 0, "failed": 0}
+    total_before = total_after = 0
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(transcode_video, path, source_url, profile): (path, time.monotonic())
+                   for path, source_url in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            path, submitted = futures[future]
+            try:
+                status, new_path, before, after = future.result()
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"[{done}/{len(jobs)}] Failed to transcode {path}. Error: {e}")
+                record_resource(path, "failed", time.monotonic() - submitted)
+                continue
+            counts[status] += 1
+            total_before += before
+            total_after += after
+            record_resource(path, status, time.monotonic() - submitted, before)
+            if status == "transcoded":
+                print(f"[{done}/{len(jobs)}] Transcoded {new_path}: {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+            else:
+                print(f"[{done}/{len(jobs)}] Left {path} as it is ({status})")
+    print(f"Transcode summary: {counts['transcoded']} transcoded, {counts['in_profile']} already in profile, "
+          f"{counts['kept']} kept, {counts['failed']} failed, "
+          f"{(total_before - total_after) / 1e6:.1f} MB reclaimed in {time.monotonic() - start:.1f}s")
+    return counts
+
+# Function to build the list of everything to fetch, each with its priority class
+def schedule_jobs():
+    jobs = []
+    for resource in resources:
+        jobs.append({"priority": resource.get("priority", DEFAULT_PRIORITY), "kind": "pdfs",
+                     "url": resource['url'], "path": os.path.join(BASE_DIR, resource['filename'])})
     for category, links in categories.items():
-        category_dir = os.path.join(BASE_DIR, category)
         for video in links:
-            video_path = os.path.join(category_dir, f"{video.split('watch?v=')[-1]}.mp4")
-            if not os.path.exists(video_path):
-                return False
+            jobs.append({"priority": CATEGORY_PRIORITY.get(category, DEFAULT_PRIORITY), "kind": "youtube",
+                         "url": video, "category": category})
+    jobs.append({"priority": ARCHIVE_PRIORITY, "kind": "archive", "url": ARCHIVE_URL})
+    jobs.append({"priority": GITHUB_PRIORITY, "kind": "github", "url": GITHUB_REPO})
+    return jobs
 
-    # Check Archive.org videos
-    archive_dir = os.path.join(BASE_DIR, "Archive_Videos")
-    if not any(os.path.isfile(os.path.join(archive_dir, f)) for f in os.listdir(archive_dir)):
-        return False
+# Function to run the scheduled jobs one priority class at a time
+# Each class is reported as "<class>:<kind>" phases, e.g. "critical:pdfs".
+def run_scheduled(jobs, video_workers=None):
+    for priority in PRIORITY_CLASSES + sorted({job["priority"] for job in jobs} - set(PRIORITY_CLASSES)):
+        selected = [job for job in jobs if job["priority"] == priority]
+        pdfs = [(job["url"], job["path"]) for job in selected if job["kind"] == "pdfs"]
+        videos = {}
+        for job in selected:
+            if job["kind"] == "youtube":
+                videos.setdefault(job["category"], []).append(job["url"])
+        if pdfs:
+            with phase(f"{priority}:pdfs"):
+                download_many(pdfs)
+        if videos:
+            with phase(f"{priority}:youtube"):
+                download_youtube_videos(video_workers, videos)
+        for job in selected:
+            if job["kind"] == "archive":
+                with phase(f"{priority}:archive"):
+                    download_archive_videos(job["url"])
+            elif job["kind"] == "github":
+                with phase(f"{priority}:github"):
+                    download_github_pdfs()
 
-    # Check GitHub files
-    github_dir = os.path.join(BASE_DIR, "HOME")
-    for root, dirs, files in os.walk(github_dir):
-        for name in files:
-            src = os.path.join(root, name)
-            dst = os.path.join(BASE_DIR, os.path.relpath(src, github_dir))
-            if not os.path.exists(dst):
-                return False
-
-    return True
+# Function to check for the existence of all files before downloading
+# Every source is looked up in the manifest and its files are checked with a stat,
+# so no directory in the library has to be listed or walked.
+def check_files_exist():
+    sources = [resource['url'] for resource in resources]
+    sources += [video for links in categories.values() for video in links]
+    sources += [ARCHIVE_URL, GITHUB_REPO]
+    # An archive run that was cut off has recorded some items but must still be finished
+    return (all(manifest_is_current(source) for source in sources)
+            and manifest_is_complete(ARCHIVE_URL) and not stale_archive_items())
 
 # Main function
 def main():
-    print("Starting download process...")
+    parser = argparse.ArgumentParser(description="Download offline survival resources.")
+    parser.add_argument("--verify", action="store_true",
+                        help="re-hash every file in the manifest instead of only the ones that changed on disk")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-check every PDF with a conditional request and download the ones that changed")
+    parser.add_argument("--sync", action="store_true",
+                        help="fetch updates to the GitHub repository even when every file already exists")
+    parser.add_argument("--metrics", default=METRICS_PATH,
+                        help="append structured JSON line events to this file (default: %(default)s)")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="seconds between live progress lines (default: %(default)s)")
+    parser.add_argument("--rate-limit", type=parse_rate, default=RATE_LIMIT,
+                        help="cap total download bandwidth, e.g. 500K or 2M bytes/sec")
+    parser.add_argument("--source-limit", action="append", default=[], metavar="HOST=RATE",
+                        help="cap bandwidth from one source, e.g. archive.org=200K (may be repeated)")
+    parser.add_argument("--video-workers", type=int, default=YTDLP_WORKERS,
+                        help="number of yt-dlp processes to run at once (default: %(default)s)")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve this library to other nodes on the local network instead of downloading")
+    parser.add_argument("--port", type=int, default=PEER_PORT,
+                        help="port --serve listens on (default: %(default)s)")
+    parser.add_argument("--peer", action="append", default=[], metavar="HOST[:PORT]",
+                        help="pull missing or changed files from another node before downloading (may be repeated)")
+    parser.add_argument("--transcode", action="store_true",
+                        help="re-encode downloaded videos to the storage profile once downloads finish")
+    parser.add_argument("--transcode-profile", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a storage profile setting, e.g. height=360 or video_bitrate=500k (may be repeated)")
+    parser.add_argument("--transcode-workers", type=int, default=TRANSCODE_WORKERS,
+                        help="number of ffmpeg processes to run at once (default: %(default)s)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="store identical files in the library once, as hardlinks into the blob store")
+    args = parser.parse_args()
+
+    profile = dict(TRANSCODE_PROFILE)
+    for setting in args.transcode_profile:
+        key, _, value = setting.partition("=")
+        key = key.strip()
+        if key not in profile:
+            parser.error(f"unknown transcode profile setting {key!r}, choose from {', '.join(profile)}")
+        if key == "height" and not (value.strip().isdigit() and int(value) > 0):
+            parser.error(f"transcode profile height must be a positive number of pixels, not {value.strip()!r}")
+        profile[key] = int(value) if key == "height" else value.strip()
+
+    source_rates = dict(SOURCE_RATE_LIMITS)
+    for limit in args.source_limit:
+        host, _, rate = limit.partition("=")
+        source_rates[host.strip()] = parse_rate(rate)
+    configure_rate_limits(args.rate_limit, source_rates)
+
+    print("Serving the library..." if args.serve else "Starting download process...")
 
     # Check for required dependencies
-    required_commands = ["yt-dlp", "git"]
+    required_commands = [] if args.serve else ["yt-dlp", "git"]
+    if args.transcode and not args.serve:
+        required_commands.append("ffmpeg")
     os_type = "windows" if os.name == "nt" else "linux"
 
     for command in required_commands:
@@ -204,15 +1633,49 @@ def main():
             print(f"Command {command} not found, installing...")
             install_package(command, os_type)
 
+    open_metrics(args.metrics)
+    stop_progress = threading.Event()
+    threading.Thread(target=progress_reporter, args=(stop_progress, args.progress_interval), daemon=True).start()
+
+    with phase("verify"):
+        verify_manifest(full=args.verify)
+
+    if args.serve:
+        stop_progress.set()
+        serve_library(args.port)
+        return
+
+    if args.peer:
+        with phase("peers"):
+            sync_from_peers(args.peer)
+
+    if args.refresh:
+        with phase("refresh"):
+            refresh_resources()
+
     if check_files_exist():
         print("All files already exist, skipping download.")
+        if args.sync:
+            with phase("github"):
+                download_github_pdfs()
     else:
-        download_pdfs()
-        download_youtube_videos()
-        download_archive_videos("https://archive.org/details/Survival_Lilly_Archive")
-        download_github_pdfs()
+        run_scheduled(schedule_jobs(), args.video_workers)
         print("Download process completed.")
 
+    if args.transcode:
+        with phase("transcode"):
+            transcode_videos(profile, args.transcode_workers)
+
+    if args.dedupe:
+        with phase("dedupe"):
+            # Only finished resources recorded in the manifest; the state files next to them
+            # (manifest, metrics, ledgers, indexes) are rewritten in place and must stay writable
+            blob_store.ingest(manifest_paths())
+            blob_store.collect_garbage()
+
+    stop_progress.set()
+    print_summary()
+
 # Run the main function
 if __name__ == "__main__":
     main()
@@ -8,6 +8,10 @@ PACKAGE_CACHE="$HOME/package_cache"
 ARCH_REPO="$HOME/archbang_package_cache"
 mkdir -p "$BASE_DIR" "$PIP_CACHE" "$PACKAGE_CACHE" "$ARCH_REPO"
 
+# Shared content-addressed store, so identical files in these directories are kept once
+BLOB_TOOL="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)/blob_store.py"
+BLOB_STORE="$BASE_DIR/.blobs"
+
 # Essential system tools (explicitly choose netcat version, and fix `fastboot` and `espeak`)
 SYSTEM_PACKAGES=(
     "base-devel" "linux-headers" "git" "wget" "curl" "rsync" "vim" "nano" "pluma" "tmux"
@@ -80,6 +84,13 @@ sudo pacman -Sy
 echo "Ensure Git is installed and cloning the survival resources from GitHub..."
 git clone --depth=1 "https://github.com/TheGodRX/offgrid.git" "$BASE_DIR/HOME" || { echo "Git clone failed!"; exit 1; }
 
+# Deduplicate the package caches into the blob store
+# The library itself is deduplicated by offgrid1.0.py --dedupe, which only takes finished resources
+# Only the packages are taken from the repository, its index is regenerated on every run
+# Packages downloaded into both $PACKAGE_CACHE and $ARCH_REPO end up stored once
+echo "Deduplicating package caches..."
+sudo python3 "$BLOB_TOOL" --store "$BLOB_STORE" ingest "$PIP_CACHE" "$PACKAGE_CACHE" "$ARCH_REPO"/*.pkg.tar.zst
+
 # Finished
 echo "All resources downloaded and system ready for offline use!"
 echo "Proceed to run python3 offgrid1.0.py to complete resource grabbing."
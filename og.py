@@ -1,11 +1,25 @@
 import os
 import subprocess
 import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
 # Folder where all resources will be saved
 BASE_DIR = "offline_survival_resources"
 os.makedirs(BASE_DIR, exist_ok=True)
 
+# Download engine settings
+MAX_WORKERS = 8       # Total concurrent downloads
+MAX_PER_HOST = 4      # Concurrent downloads allowed against a single host
+MAX_RETRIES = 3       # Extra attempts after the first failure
+RETRY_BACKOFF = 1.0   # Seconds, doubled after every failed attempt
+MIN_CHUNK_SIZE = 64 * 1024         # Starting read size for a transfer
+MAX_CHUNK_SIZE = 4 * 1024 * 1024   # Largest read size the adaptive sizing will grow to
+CHUNK_TARGET_SECONDS = 0.25        # Aim for reads that take about this long
+
 # Define categories and their corresponding YouTube video links
 categories = {
     "Medical": [
@@ -44,23 +58,119 @@ resources = [
     {"url": "https://archive.org.details/SelfSufficiencyGuide", "filename": "Self_Sufficiency_Guide.pdf"}
 ]
 
+# Shared HTTP session so workers reuse pooled keep-alive connections
+_session = None
+_session_lock = threading.Lock()
+
+# One semaphore per host to cap concurrent connections to it
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+def host_slot(url):
+    host = urlparse(url).netloc
+    with _host_slots_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+        return _host_slots[host]
+
+# Function to grow or shrink the read size so each read takes about CHUNK_TARGET_SECONDS
+def next_chunk_size(chunk_size, nbytes, elapsed):
+    if elapsed <= 0:
+        return min(chunk_size * 2, MAX_CHUNK_SIZE)
+    target = int(nbytes / elapsed * CHUNK_TARGET_SECONDS)
+    return max(MIN_CHUNK_SIZE, min(target, chunk_size * 2, MAX_CHUNK_SIZE))
+
+# Function to stream a URL into a .part file, resuming from whatever is already there
+def fetch_to_part(url, part_path):
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with get_session().get(url, stream=True, timeout=30, headers=headers) as response:
+        if response.status_code == 416 and offset:
+            # Nothing left to send; the .part file is complete if it matches the full size
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                return
+            os.remove(part_path)
+            raise IOError(f"Server rejected resume of {part_path}, restarting")
+        response.raise_for_status()
+        if response.status_code == 206:
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            expected = int(total) if total.isdigit() else None
+            mode = 'ab'
+        else:
+            # Server ignored the Range header, start over
+            length = response.headers.get("Content-Length", "")
+            # Content-Length counts encoded bytes, so it can only be checked for identity bodies
+            encoded = "Content-Encoding" in response.headers
+            expected = int(length) if length.isdigit() and not encoded else None
+            offset = 0
+            mode = 'wb'
+        written = offset
+        chunk_size = MIN_CHUNK_SIZE
+        with open(part_path, mode) as file:
+            while True:
+                started = time.monotonic()
+                chunk = response.raw.read(chunk_size, decode_content=True)
+                if not chunk:
+                    break
+                file.write(chunk)
+                written += len(chunk)
+                chunk_size = next_chunk_size(chunk_size, len(chunk), time.monotonic() - started)
+    if expected is not None and written != expected:
+        raise IOError(f"Incomplete download of {url}: got {written} of {expected} bytes")
+
 # Function to download a file from the web using requests
 def download_file(url, save_path):
-    try:
-        print(f"Downloading from {url}...")
-        response = requests.get(url, stream=True)
-        with open(save_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        print(f"Downloaded {save_path}")
-    except Exception as e:
-        print(f"Failed to download {url}. Error: {e}")
+    part_path = save_path + ".part"
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            print(f"Downloading from {url}...")
+            with host_slot(url):
+                fetch_to_part(url, part_path)
+            os.replace(part_path, save_path)
+            print(f"Downloaded {save_path}")
+            return "downloaded"
+        except Exception as e:
+            # Client errors (other than rate limiting) will not fix themselves on retry
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            retryable = status is None or status >= 500 or status == 429
+            if retryable and attempt < MAX_RETRIES:
+                delay = RETRY_BACKOFF * (2 ** attempt)
+                print(f"Failed to download {url} (attempt {attempt + 1}). Retrying in {delay:.0f}s. Error: {e}")
+                time.sleep(delay)
+            else:
+                print(f"Failed to download {url}. Error: {e}")
+                return "failed"
+
+# Function to download many files concurrently and print a single summary
+def download_many(jobs, max_workers=MAX_WORKERS):
+    results = {"downloaded": [], "skipped": [], "failed": []}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(download_file, url, save_path): url for url, save_path in jobs}
+        for future in as_completed(futures):
+            results[future.result()].append(futures[future])
+    elapsed = time.monotonic() - start
+    print(f"Download summary: {len(results['downloaded'])} downloaded, "
+          f"{len(results['skipped'])} skipped, {len(results['failed'])} failed in {elapsed:.1f}s")
+    for url in results["failed"]:
+        print(f"  Failed: {url}")
+    return results
 
 # Download PDF resources
 def download_pdfs():
-    for resource in resources:
-        save_path = os.path.join(BASE_DIR, resource['filename'])
-        download_file(resource['url'], save_path)
+    jobs = [(resource['url'], os.path.join(BASE_DIR, resource['filename'])) for resource in resources]
+    return download_many(jobs)
 
 # Function to download YouTube videos into categories
 def download_youtube_videos():
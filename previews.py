@@ -0,0 +1,107 @@
+import os
+import sys
+import hashlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+# Folder where all resources are saved
+BASE_DIR = "offline_survival_resources"
+
+# Thumbnails of PDFs (first page) and videos (a poster frame) for the resource browser
+# Each preview is a PNG named after the file's path, size and mtime, so a changed file
+# simply gets a new preview and the old one is dropped on the next update.
+PREVIEW_DIR = os.path.join(BASE_DIR, ".previews")
+PREVIEW_SIZE = 160  # Longest side of a preview, in pixels
+PREVIEW_WORKERS = os.cpu_count() or 2
+POSTER_SECONDS = 3  # How far into a video its poster frame is taken
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".avi", ".mov", ".m4v", ".flv")
+
+# Function to get the cache key of a file from its path, size and mtime
+def preview_key(path, size, mtime_ns):
+    return hashlib.sha1(f"{os.path.abspath(path)}\0{size}\0{mtime_ns}".encode()).hexdigest()
+
+# Function to get the preview PNG of a file, or None if it has none (yet)
+def preview_path(path, preview_dir=PREVIEW_DIR):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    png = os.path.join(preview_dir, preview_key(path, stat.st_size, stat.st_mtime_ns) + ".png")
+    # Files that could not be previewed are marked with an empty PNG
+    return png if os.path.isfile(png) and os.path.getsize(png) > 0 else None
+
+# Function to list every PDF and video under a directory with its size and mtime
+def find_previewable(directory):
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if not entry.name.startswith("."):
+                yield from find_previewable(entry.path)
+        elif entry.name.lower().endswith((".pdf",) + VIDEO_EXTENSIONS):
+            stat = entry.stat()
+            yield entry.path, stat.st_size, stat.st_mtime_ns
+
+# Function to render the first page of a PDF as PNG bytes
+def pdf_preview(path):
+    import fitz  # PyMuPDF for PDFs
+
+    with fitz.open(path) as doc:
+        page = doc.load_page(0)
+        zoom = PREVIEW_SIZE / max(page.rect.width, page.rect.height)
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes("png")
+
+# Function to grab a poster frame from a video as PNG bytes
+# Seeking a few seconds in skips black intro frames; videos shorter than that use their first frame.
+def video_preview(path):
+    fit = f"scale={PREVIEW_SIZE}:{PREVIEW_SIZE}:force_original_aspect_ratio=decrease"
+    for seek in (["-ss", str(POSTER_SECONDS)], []):
+        result = subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", *seek, "-i", path,
+                                 "-frames:v", "1", "-vf", fit, "-f", "image2pipe", "-c:v", "png", "pipe:1"],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode == 0 and result.stdout:
+            return result.stdout
+    raise RuntimeError(result.stderr.decode(errors="replace").strip() or "no frame could be decoded")
+
+# Function to write the preview of one file (runs in a worker process)
+def make_preview(path, png):
+    try:
+        data = pdf_preview(path) if path.lower().endswith(".pdf") else video_preview(path)
+    except Exception as e:
+        print(f"Failed to preview {path}. Error: {e}")
+        data = b""
+    # Written under a temporary name so the browser never loads a half-written PNG
+    with open(png + ".tmp", 'wb') as file:
+        file.write(data)
+    os.replace(png + ".tmp", png)
+    return path
+
+# Function to bring the preview cache up to date with the library
+# Only new or changed files get a preview made, spread across a pool of processes,
+# and previews of files that changed or disappeared are deleted.
+def update_previews(base_dir=BASE_DIR, preview_dir=PREVIEW_DIR, workers=PREVIEW_WORKERS):
+    os.makedirs(preview_dir, exist_ok=True)
+    wanted = {}
+    for path, size, mtime_ns in find_previewable(base_dir):
+        wanted[preview_key(path, size, mtime_ns) + ".png"] = path
+    existing = set(os.listdir(preview_dir))
+
+    removed = 0
+    for name in existing - set(wanted):
+        os.remove(os.path.join(preview_dir, name))
+        removed += 1
+
+    todo = [(path, os.path.join(preview_dir, name)) for name, path in wanted.items() if name not in existing]
+    if todo:
+        print(f"Making {len(todo)} previews with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(make_preview, *zip(*todo)):
+                pass
+    print(f"Previews updated: {len(todo)} made, {removed} removed, {len(wanted)} files total")
+    return len(todo), removed
+
+# Update the preview cache
+if __name__ == "__main__":
+    update_previews(sys.argv[1] if len(sys.argv) > 1 else BASE_DIR)
@@ -0,0 +1,124 @@
+import os
+import sys
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+# Folder where all resources are saved
+BASE_DIR = "offline_survival_resources"
+
+# Full-text index of every PDF page in the library
+INDEX_PATH = os.path.join(BASE_DIR, ".search_index.sqlite")
+INDEX_WORKERS = os.cpu_count() or 2
+
+# Each page is stored under rowid = document id * PAGES_PER_DOCUMENT + page number,
+# so a document's pages can be dropped with a single rowid range delete
+PAGES_PER_DOCUMENT = 1 << 20
+
+# Function to open (and create if needed) the search index
+def open_index(path=INDEX_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            path TEXT UNIQUE NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        )""")
+    db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(text, tokenize='porter unicode61')")
+    db.commit()
+    return db
+
+# Function to list every PDF under a directory with its size and mtime
+def find_pdfs(directory):
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if not entry.name.startswith("."):
+                yield from find_pdfs(entry.path)
+        elif entry.name.lower().endswith(".pdf"):
+            stat = entry.stat()
+            yield entry.path, stat.st_size, stat.st_mtime_ns
+
+# Function to pull the text out of every page of a PDF (runs in a worker process)
+# PyMuPDF is imported here rather than at the top so searching never loads it.
+def extract_pdf_text(path):
+    import fitz  # PyMuPDF for PDFs
+
+    try:
+        with fitz.open(path) as doc:
+            return path, [page.get_text() for page in doc]
+    except Exception as e:
+        print(f"Failed to index {path}. Error: {e}")
+        return path, []
+
+# Function to drop a document and its pages from the index
+def remove_document(db, doc_id):
+    first = doc_id * PAGES_PER_DOCUMENT
+    db.execute("DELETE FROM pages WHERE rowid BETWEEN ? AND ?", (first, first + PAGES_PER_DOCUMENT - 1))
+    db.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+# Function to bring the index up to date with the library
+# Only PDFs that are new or whose size or mtime changed are extracted again,
+# spread across a pool of processes.
+def update_index(db, base_dir=BASE_DIR, workers=INDEX_WORKERS):
+    known = {path: (doc_id, size, mtime_ns)
+             for doc_id, path, size, mtime_ns in db.execute("SELECT id, path, size, mtime_ns FROM documents")}
+    current = {path: (size, mtime_ns) for path, size, mtime_ns in find_pdfs(base_dir)}
+
+    stale = [path for path in known if path not in current or current[path] != known[path][1:]]
+    for path in stale:
+        remove_document(db, known[path][0])
+    db.commit()
+
+    todo = [path for path in current if path not in known or path in stale]
+    if todo:
+        print(f"Indexing {len(todo)} PDFs with {workers} workers...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, texts in pool.map(extract_pdf_text, todo):
+                size, mtime_ns = current[path]
+                doc_id = db.execute("INSERT INTO documents (path, size, mtime_ns) VALUES (?, ?, ?)",
+                                    (path, size, mtime_ns)).lastrowid
+                db.executemany("INSERT INTO pages (rowid, text) VALUES (?, ?)",
+                               [(doc_id * PAGES_PER_DOCUMENT + page_num, text)
+                                for page_num, text in enumerate(texts[:PAGES_PER_DOCUMENT]) if text.strip()])
+                db.commit()
+    removed = len([path for path in stale if path not in current])
+    print(f"Search index updated: {len(todo)} indexed, {removed} removed, {len(current)} PDFs total")
+    return len(todo), removed
+
+# Function to turn what the user typed into an FTS5 query
+# Every word must match, and the last one is treated as a prefix for search-as-you-type.
+def build_query(text):
+    words = ["".join(ch for ch in word if ch.isalnum()) for word in text.split()]
+    words = [word for word in words if word]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+# Function to search the index, returning ranked (path, page number, snippet) hits
+def search(db, text, limit=50):
+    query = build_query(text)
+    if query is None:
+        return []
+    rows = db.execute("""
+        SELECT documents.path, pages.rowid % ?, snippet(pages, 0, '[', ']', '...', 10)
+        FROM pages JOIN documents ON documents.id = pages.rowid / ?
+        WHERE pages MATCH ?
+        ORDER BY rank
+        LIMIT ?""", (PAGES_PER_DOCUMENT, PAGES_PER_DOCUMENT, query, limit))
+    return [(path, page_num, " ".join(snippet.split())) for path, page_num, snippet in rows]
+
+# Update the index, then search it if a query was given on the command line
+if __name__ == "__main__":
+    db = open_index()
+    update_index(db)
+    if len(sys.argv) > 1:
+        for path, page_num, snippet in search(db, " ".join(sys.argv[1:])):
+            print(f"{path} (page {page_num + 1}): {snippet}")